@@ -0,0 +1,71 @@
+"""
+Compaction benchmark: distinct information per KB of tool output.
+
+For each fixture query, compares the current output (content prefix truncated to 500
+characters, row-oriented JSON) with the compacted output (near-duplicate passages dropped,
+query-term windows, columnar JSON). Distinct information is measured as the number of
+distinct word 3-shingles in the output; prompt tokens are approximated as bytes / 4.
+
+Usage:
+    python benchmarks/compaction_benchmark.py [fixture file] [limit]
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reranker import tokenize
+from result_compaction import ResultCompactor
+
+FIXTURE_FILE = Path(__file__).parent / "fixtures" / "rerank_labeled.json"
+
+
+def distinct_shingles(docs: list) -> int:
+    """Number of distinct word 3-shingles across the content of the documents."""
+    shingles = set()
+    for doc in docs:
+        tokens = tokenize(str(doc.get("content", "")))
+        shingles.update(" ".join(tokens[i:i + 3]) for i in range(max(len(tokens) - 2, 1)))
+    return len(shingles)
+
+
+def main() -> None:
+    fixture_file = Path(sys.argv[1]) if len(sys.argv) > 1 else FIXTURE_FILE
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with fixture_file.open("r", encoding="utf-8") as file:
+        queries = json.load(file)["queries"]
+
+    compactor = ResultCompactor()
+    totals = {"baseline_bytes": 0, "compact_bytes": 0, "baseline_info": 0, "compact_info": 0}
+
+    for item in queries:
+        docs = [{"_id": doc["_id"], "content": doc["content"]} for doc in item["candidates"]]
+
+        baseline = [{"_id": doc["_id"], "content": doc["content"][:500] + ("..." if len(doc["content"]) > 500 else "")}
+                    for doc in docs[:limit]]
+        baseline_bytes = len(json.dumps(baseline).encode("utf-8"))
+
+        compacted = compactor.compact(docs[:limit * compactor.overfetch], item["query"])[:limit]
+        compact_bytes = len(json.dumps(ResultCompactor.to_columnar(compacted), separators=(",", ":")).encode("utf-8"))
+
+        totals["baseline_bytes"] += baseline_bytes
+        totals["compact_bytes"] += compact_bytes
+        totals["baseline_info"] += distinct_shingles(baseline)
+        totals["compact_info"] += distinct_shingles(compacted)
+
+        print(f"{item['query'][:40]:<40} baseline={baseline_bytes}B/{distinct_shingles(baseline)} shingles "
+              f"compact={compact_bytes}B/{distinct_shingles(compacted)} shingles")
+
+    print()
+    for name in ("baseline", "compact"):
+        kb = totals[f"{name}_bytes"] / 1024
+        print(f"{name:<8}: {totals[f'{name}_bytes']}B (~{totals[f'{name}_bytes'] // 4} tokens), "
+              f"{totals[f'{name}_info'] / kb:.1f} distinct shingles per KB")
+    print(f"Passages dropped: {compactor.stats['passages_dropped']}, "
+          f"documents dropped: {compactor.stats['documents_dropped']}")
+
+
+if __name__ == "__main__":
+    main()
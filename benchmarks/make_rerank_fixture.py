@@ -0,0 +1,270 @@
+"""
+Generate the labeled rerank fixture used by `rerank_benchmark.py`.
+
+The fixture is built from a synthetic product catalog, but nothing in it is tuned to the
+labels:
+
+- Products have structured attributes (weight, temperature rating, burners, ...) and a
+  description drawn from templates. Marketing words such as "lightweight" or "warm" are
+  sprinkled on at random, independently of the attributes they seem to describe.
+- Labels follow a fixed rubric on the attributes: 2 when the product is of the queried
+  category and meets the query's requirement, 1 when it is of the category only, 0 otherwise.
+- Embeddings are feature-hashed word and character-trigram vectors (`hashed_embedding`).
+  They are lexical, not semantic, and stand in for a real embedding model offline.
+- The candidate order is a reciprocal rank fusion of a cosine ranking and a BM25 ranking over
+  the whole catalog, weighted 0.7/0.3 like the search tool's `$rankFusion` stage. Atlas
+  `$search` scoring differs from this BM25, so the order approximates `$rankFusion` rather
+  than reproducing it.
+
+Usage:
+    python benchmarks/make_rerank_fixture.py [output file] [candidates per query]
+"""
+
+import hashlib
+import json
+import math
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reranker import tokenize
+
+FIXTURE_FILE = Path(__file__).parent / "fixtures" / "rerank_labeled.json"
+DIMENSIONS = 64
+PRODUCTS_PER_CATEGORY = 20
+RRF_K = 60
+WEIGHTS = {"vector": 0.7, "text": 0.3}
+SEED = 7
+
+MARKETING = ("lightweight", "warm", "durable", "premium", "compact", "budget", "family", "rugged")
+BOILERPLATE = ("Free shipping on orders over $50.", "30 day return policy on all outdoor gear.",
+               "Ships in 2 business days.")
+
+
+def _tent(rng):
+    weight = round(rng.uniform(1.0, 4.5), 1)
+    sleeps = rng.choice((1, 2, 3, 4, 6))
+    return {"weight_kg": weight}, (
+        f"{sleeps} person tent with aluminium poles, vestibule and rainfly. "
+        f"Packed weight {weight} kg. {rng.choice(('Freestanding design.', 'Two doors.', 'Color coded clips.'))}")
+
+
+def _sleeping_bag(rng):
+    rating = rng.choice((-15, -10, -5, 0, 5, 10))
+    fill = rng.choice(("down", "synthetic"))
+    return {"rating_c": rating}, (
+        f"{fill.capitalize()} sleeping bag with a comfort rating of {rating} C, draft collar and "
+        f"compression sack. {rng.choice(('Mummy shape.', 'Rectangular shape.', 'Two way zipper.'))}")
+
+
+def _backpack(rng):
+    litres = rng.choice((20, 30, 40, 50, 65))
+    rain_cover = rng.random() < 0.5
+    extras = "integrated rain cover" if rain_cover else "water resistant fabric"
+    return {"rain_cover": rain_cover}, (
+        f"{litres} litre hiking backpack with hip belt, hydration sleeve and {extras}. "
+        f"{rng.choice(('Adjustable back length.', 'Side mesh pockets.', 'Trekking pole loops.'))}")
+
+
+def _stove(rng):
+    burners = rng.choice((1, 2, 3))
+    fuel = rng.choice(("propane", "butane", "multi fuel"))
+    return {"burners": burners}, (
+        f"Camping stove with {burners} burner{'s' if burners > 1 else ''} running on {fuel}, "
+        f"piezo ignition and wind screen for outdoor cooking. "
+        f"{rng.choice(('Folding legs.', 'Simmer control.', 'Carry case included.'))}")
+
+
+def _boots(rng):
+    waterproof = rng.random() < 0.5
+    membrane = "waterproof membrane" if waterproof else "breathable mesh lining"
+    return {"waterproof": waterproof}, (
+        f"Hiking boots with {membrane}, vibram sole and ankle support. "
+        f"{rng.choice(('Two year warranty.', 'Speed lacing.', 'Leather upper.'))}")
+
+
+def _jacket(rng):
+    hood = rng.random() < 0.5
+    collar = "adjustable hood" if hood else "stand up collar"
+    return {"hood": hood}, (
+        f"Breathable rain jacket with sealed seams, {collar} and {rng.choice((2, 3, 4))} zip pockets. "
+        f"{rng.choice(('Packs into its own pocket.', 'Pit zips.', 'Reflective details.'))}")
+
+
+def _lantern(rng):
+    rechargeable = rng.random() < 0.5
+    power = "rechargeable battery with USB charging" if rechargeable else "3 AA batteries"
+    return {"rechargeable": rechargeable}, (
+        f"LED camping lantern, {rng.choice((200, 300, 400, 600))} lumens, powered by {power}. "
+        f"{rng.choice(('Hanging hook.', 'Red night mode.', 'Collapsible globe.'))}")
+
+
+def _kayak(rng):
+    sit_on_top = rng.random() < 0.5
+    paddle = rng.random() < 0.5
+    kind = "Sit-on-top" if sit_on_top else "Sit-in touring"
+    extras = "paddle included" if paddle else "paddle sold separately"
+    return {"sit_on_top": sit_on_top, "paddle": paddle}, (
+        f"{kind} kayak, {rng.choice((3, 4, 5))} metres, with adjustable seat and {extras}. "
+        f"{rng.choice(('Rod holders.', 'Dry hatch.', 'Skeg for tracking.'))}")
+
+
+CATEGORIES = {
+    "tent": _tent,
+    "sleeping bag": _sleeping_bag,
+    "backpack": _backpack,
+    "stove": _stove,
+    "boots": _boots,
+    "jacket": _jacket,
+    "lantern": _lantern,
+    "kayak": _kayak,
+}
+
+# Query, category and the attribute requirement for label 2
+QUERIES = (
+    ("lightweight tent for backpacking", "tent", lambda a: a["weight_kg"] <= 2.0),
+    ("warm sleeping bag for winter camping", "sleeping bag", lambda a: a["rating_c"] <= -5),
+    ("hiking backpack with rain cover", "backpack", lambda a: a["rain_cover"]),
+    ("two burner camping stove", "stove", lambda a: a["burners"] == 2),
+    ("waterproof hiking boots", "boots", lambda a: a["waterproof"]),
+    ("breathable rain jacket with hood", "jacket", lambda a: a["hood"]),
+    ("rechargeable lantern for tent", "lantern", lambda a: a["rechargeable"]),
+    ("sit-on-top kayak with paddle", "kayak", lambda a: a["sit_on_top"] and a["paddle"]),
+)
+
+
+def build_catalog(rng: random.Random) -> list:
+    """Products with attributes and a description."""
+    catalog = []
+    for category, make in CATEGORIES.items():
+        for _ in range(PRODUCTS_PER_CATEGORY):
+            attributes, description = make(rng)
+            marketing = " ".join(rng.sample(MARKETING, 2)).capitalize()
+            content = f"{marketing} {description} {rng.choice(BOILERPLATE)}"
+            catalog.append({
+                "_id": f"p{len(catalog) + 1:03d}",
+                "category": category,
+                "attributes": attributes,
+                "content": content,
+            })
+    return catalog
+
+
+def hashed_embedding(text: str, dimensions: int = DIMENSIONS) -> list:
+    """Unit-length feature-hashed vector of the word and character-trigram counts of a text."""
+    vector = [0.0] * dimensions
+    features = tokenize(text)
+    for word in list(features):
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    for feature in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "big") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [round(value / norm, 4) for value in vector]
+
+
+def bm25_ranking(query: str, catalog: list, k1: float = 1.2, b: float = 0.75) -> list:
+    """Catalog indexes ranked by BM25 of the query over the whole catalog."""
+    documents = [tokenize(product["content"]) for product in catalog]
+    average_length = sum(len(terms) for terms in documents) / len(documents)
+    document_frequency = Counter(term for terms in documents for term in set(terms))
+    scores = []
+    for terms in documents:
+        counts = Counter(terms)
+        score = 0.0
+        for term in set(tokenize(query)):
+            if term not in counts:
+                continue
+            idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            tf = counts[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(terms) / average_length))
+        scores.append(score)
+    return [index for index in sorted(range(len(catalog)), key=lambda i: -scores[i]) if scores[index] > 0]
+
+
+def vector_ranking(query_vector: list, vectors: list) -> list:
+    """Catalog indexes ranked by cosine similarity to the query vector (vectors are unit length)."""
+    scores = [sum(q * v for q, v in zip(query_vector, vector)) for vector in vectors]
+    return sorted(range(len(vectors)), key=lambda i: -scores[i])
+
+
+def rank_fusion(rankings: dict, count: int) -> list:
+    """Weighted reciprocal rank fusion of several rankings, like `$rankFusion`."""
+    scores = Counter()
+    for name, ranking in rankings.items():
+        for rank, index in enumerate(ranking):
+            scores[index] += WEIGHTS[name] / (RRF_K + rank + 1)
+    return [index for index, _ in scores.most_common(count)]
+
+
+def label(product: dict, category: str, requirement) -> int:
+    if product["category"] != category:
+        return 0
+    return 2 if requirement(product["attributes"]) else 1
+
+
+def build_fixture(count: int) -> dict:
+    rng = random.Random(SEED)
+    catalog = build_catalog(rng)
+    vectors = [hashed_embedding(product["content"]) for product in catalog]
+
+    queries = []
+    for query, category, requirement in QUERIES:
+        query_vector = hashed_embedding(query)
+        fused = rank_fusion({
+            "vector": vector_ranking(query_vector, vectors),
+            "text": bm25_ranking(query, catalog),
+        }, count)
+        queries.append({
+            "query": query,
+            "query_vector": query_vector,
+            "candidates": [{
+                "_id": catalog[index]["_id"],
+                "content": catalog[index]["content"],
+                "embedding": vectors[index],
+                "label": label(catalog[index], category, requirement),
+            } for index in fused],
+        })
+
+    return {
+        "description": (
+            f"Generated by benchmarks/make_rerank_fixture.py (seed {SEED}): {len(QUERIES)} queries x {count} "
+            f"candidates in reciprocal-rank-fusion order (cosine 0.7, BM25 0.3) over a {len(catalog)} product "
+            f"catalog. label 2 = category and requirement match, 1 = category match, 0 = other. "
+            f"{DIMENSIONS}-dim feature-hashed lexical embeddings, not a semantic model."
+        ),
+        "queries": queries,
+    }
+
+
+def write_fixture(fixture: dict, path: Path) -> None:
+    """Write the fixture with one candidate per line, so diffs stay readable."""
+    lines = ["{", f' "description": {json.dumps(fixture["description"])},', ' "queries": [']
+    for query_index, item in enumerate(fixture["queries"]):
+        lines.append("  {")
+        lines.append(f'   "query": {json.dumps(item["query"])},')
+        lines.append(f'   "query_vector": {json.dumps(item["query_vector"])},')
+        lines.append('   "candidates": [')
+        candidates = [f"    {json.dumps(candidate)}" for candidate in item["candidates"]]
+        lines.append(",\n".join(candidates))
+        lines.append("   ]")
+        lines.append("  }" + ("," if query_index < len(fixture["queries"]) - 1 else ""))
+    lines.extend([" ]", "}"])
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else FIXTURE_FILE
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    fixture = build_fixture(count)
+    write_fixture(fixture, path)
+    print(f"Wrote {len(fixture['queries'])} queries x {count} candidates to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Rerank benchmark: CPU cost per query and relevance against a labeled fixture set.
+
+Compares the fusion order of each fixture query (the order candidates are stored in) with
+the order produced by `LightweightReranker`, using NDCG@k, and measures the CPU time spent
+reranking one query. The default fixture is synthetic and generated by
+`make_rerank_fixture.py`; see its docstring for how the order, labels and embeddings are built.
+
+The fixture's embeddings have 64 dimensions, so the CPU time is also measured on random
+candidates at a production embedding size (1536 dimensions, 2000 characters of content).
+
+Usage:
+    python benchmarks/rerank_benchmark.py [fixture file] [k]
+"""
+
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reranker import LightweightReranker
+
+FIXTURE_FILE = Path(__file__).parent / "fixtures" / "rerank_labeled.json"
+ITERATIONS = 200
+# Production-sized candidates for the CPU measurement
+REAL_DIMENSIONS = 1536
+REAL_CANDIDATES = 25
+REAL_CONTENT_CHARS = 2000
+
+
+def ndcg_at_k(labels: list, k: int) -> float:
+    """NDCG@k of a ranked list of graded relevance labels."""
+    def dcg(values):
+        return sum((2 ** rel - 1) / math.log2(rank + 2) for rank, rel in enumerate(values[:k]))
+    ideal = dcg(sorted(labels, reverse=True))
+    return dcg(labels) / ideal if ideal else 0.0
+
+
+def cpu_ms_at_real_size(reranker: LightweightReranker, seed: int = 1) -> float:
+    """CPU milliseconds to rerank REAL_CANDIDATES random candidates with REAL_DIMENSIONS embeddings."""
+    rng = random.Random(seed)
+    words = "tent sleeping bag stove lantern kayak boots jacket waterproof lightweight trail".split()
+    docs = [{
+        "_id": index,
+        "content": " ".join(rng.choice(words) for _ in range(REAL_CONTENT_CHARS // 6))[:REAL_CONTENT_CHARS],
+        "embedding": [rng.uniform(-1, 1) for _ in range(REAL_DIMENSIONS)],
+    } for index in range(REAL_CANDIDATES)]
+    query_vector = [rng.uniform(-1, 1) for _ in range(REAL_DIMENSIONS)]
+    reranker.rerank("warm up", query_vector, docs)
+    iterations = ITERATIONS // 4
+    start = time.process_time()
+    for _ in range(iterations):
+        reranker.rerank("lightweight waterproof tent", query_vector, docs)
+    return (time.process_time() - start) * 1000 / iterations
+
+
+def main() -> None:
+    fixture_file = Path(sys.argv[1]) if len(sys.argv) > 1 else FIXTURE_FILE
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with fixture_file.open("r", encoding="utf-8") as file:
+        queries = json.load(file)["queries"]
+
+    reranker = LightweightReranker()
+    fusion_scores, rerank_scores, cpu_ms = [], [], []
+
+    for item in queries:
+        candidates = item["candidates"]
+        labels = {doc["_id"]: doc["label"] for doc in candidates}
+        docs = [{key: value for key, value in doc.items() if key != "label"} for doc in candidates]
+
+        fusion_scores.append(ndcg_at_k([labels[doc["_id"]] for doc in docs], k))
+
+        start = time.process_time()
+        for _ in range(ITERATIONS):
+            ranked = reranker.rerank(item["query"], item["query_vector"], docs)
+        cpu_ms.append((time.process_time() - start) * 1000 / ITERATIONS)
+        rerank_scores.append(ndcg_at_k([labels[doc["_id"]] for doc in ranked], k))
+
+        print(f"{item['query'][:40]:<40} fusion NDCG@{k}={fusion_scores[-1]:.3f} "
+              f"rerank NDCG@{k}={rerank_scores[-1]:.3f} cpu={cpu_ms[-1]:.3f}ms")
+
+    real_cpu_ms = cpu_ms_at_real_size(reranker)
+    reranker.close()
+    n = len(queries)
+    print()
+    print(f"Queries: {n}, candidates per query: {len(queries[0]['candidates']) if n else 0}")
+    print(f"Mean NDCG@{k}: fusion={sum(fusion_scores) / n:.3f} rerank={sum(rerank_scores) / n:.3f}")
+    print(f"CPU per query: mean={sum(cpu_ms) / n:.3f}ms max={max(cpu_ms):.3f}ms")
+    print(f"CPU per query at {REAL_DIMENSIONS}-dim embeddings, {REAL_CANDIDATES} candidates of "
+          f"{REAL_CONTENT_CHARS} chars: {real_cpu_ms:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
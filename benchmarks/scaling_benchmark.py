@@ -0,0 +1,115 @@
+"""
+Scaling benchmark: search throughput with 1 to N worker processes on stubbed backends.
+
+Each worker runs the real search tool code on the fake MongoDB and embeddings backends from
+`fake_backends.py`, so the numbers measure the tool's own per-process limits (serialization,
+truncation, rerank) rather than a live cluster. The fake latencies are simulated I/O that
+overlaps within one process; each fake search also burns FAKE_SEARCH_CPU_MS (default 5 here) of
+CPU, like pymongo decoding BSON. The benchmark reports the CPU time per query (workers and
+dispatcher): with C cores, throughput can't exceed C / CPU time per query, and speed-ups past the
+core count come from overlapping I/O, not from extra cores. All runs cache results for
+SEARCH_RESULT_CACHE_TTL_SECONDS (default 60 here), and a fraction of the queries repeat earlier
+ones to show hits on the shared cache tier.
+
+Usage:
+    python benchmarks/scaling_benchmark.py [max workers] [queries per run] [repeat fraction]
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_backends import WORDS, fake_searcher_factory
+from worker_pool import WorkerPool
+
+CONCURRENCY = 64
+
+# Inherited by the spawned workers
+os.environ.setdefault("FAKE_SEARCH_CPU_MS", "5")
+os.environ.setdefault("SEARCH_RESULT_CACHE_TTL_SECONDS", "60")
+
+
+def make_queries(count: int, repeat_fraction: float, seed: int = 1) -> list:
+    """Distinct random queries, with `repeat_fraction` of them repeating an earlier query."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        if queries and rng.random() < repeat_fraction:
+            queries.append(rng.choice(queries))
+        else:
+            queries.append(" ".join(rng.sample(WORDS, 4)) + f" {rng.randrange(10 ** 6)}")
+    return queries
+
+
+async def run(num_workers: int, queries: list) -> dict:
+    # Every run may have CONCURRENCY searches in flight, so more workers add cores, not I/O slots
+    pool = WorkerPool(num_workers=num_workers, searcher_factory=fake_searcher_factory,
+                      concurrency_per_worker=CONCURRENCY)
+    await pool.warm_up()
+    before = await pool.get_metrics()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(query: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await pool.async_hybrid_search_mongodb_atlas(query, limit=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    dispatcher_cpu = time.process_time()
+    await asyncio.gather(*(one(query) for query in queries))
+    elapsed = time.perf_counter() - start
+    dispatcher_cpu = time.process_time() - dispatcher_cpu
+
+    metrics = await pool.get_metrics()
+    await pool.close()
+    worker_cpu = (sum(worker["cpu_seconds"] for worker in metrics["workers"])
+                  - sum(worker["cpu_seconds"] for worker in before["workers"]))
+    hit_rates = {}
+    for name, prefix in (("embedding", "embedding"), ("result", "search")):
+        counts = [worker["cache"]["by_prefix"].get(prefix, {}) for worker in metrics["workers"]]
+        hits = sum(count.get("hits", 0) for count in counts)
+        lookups = hits + sum(count.get("misses", 0) for count in counts)
+        hit_rates[name] = hits / lookups if lookups else 0.0
+    latencies.sort()
+    return {
+        "qps": len(queries) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "hit_rates": hit_rates,
+        "worker_cpu_ms": worker_cpu * 1000 / len(queries),
+        "dispatcher_cpu_ms": dispatcher_cpu * 1000 / len(queries),
+    }
+
+
+async def main() -> None:
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    repeat_fraction = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    queries = make_queries(count, repeat_fraction)
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    print(f"{cores} cores, {count} queries, {repeat_fraction:.0%} repeats, concurrency {CONCURRENCY}, "
+          f"fake latencies: embed {os.getenv('FAKE_EMBEDDING_LATENCY_MS', '40')}ms, "
+          f"search {os.getenv('FAKE_SEARCH_LATENCY_MS', '25')}ms + {os.environ['FAKE_SEARCH_CPU_MS']}ms CPU")
+    baseline = None
+    for num_workers in range(1, max_workers + 1):
+        result = await run(num_workers, queries)
+        baseline = baseline or result["qps"]
+        cpu_ms = result["worker_cpu_ms"] + result["dispatcher_cpu_ms"]
+        print(f"workers={num_workers:<3} {result['qps']:8.1f} q/s (x{result['qps'] / baseline:.2f}) "
+              f"p50={result['p50']:.1f}ms p95={result['p95']:.1f}ms "
+              f"cpu/query={result['worker_cpu_ms']:.2f}ms worker + {result['dispatcher_cpu_ms']:.2f}ms dispatcher "
+              f"(CPU-bound ceiling {cores * 1000 / cpu_ms:.0f} q/s) cache hit rate: "
+              f"embedding={result['hit_rates']['embedding']:.0%} result={result['hit_rates']['result']:.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+"""
+Startup benchmark: time to import `main.py` in a fresh interpreter.
+
+Each run starts a new Python process so module caches don't hide the import cost.
+Time-to-first-answer needs live Azure and MongoDB backends; `python main.py` reports it
+after the first question together with the import and warm-up timings.
+
+Usage:
+    python benchmarks/startup_benchmark.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = dict(os.environ)
+    env.setdefault("PROJECT_ENDPOINT", "https://example.services.ai.azure.com/api/projects/example")
+
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SNIPPET], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]) * 1000)
+
+    print(f"import main: median={statistics.median(timings):.1f}ms "
+          f"min={min(timings):.1f}ms max={max(timings):.1f}ms over {runs} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Lazily constructed application components and startup timing.
+
+Nothing heavy is imported or connected when this module is imported: the Azure credential,
+the `AgentsClient`, the search tool and the MongoDB/embeddings connections are created on
+first use. `warm_up()` prefetches the credential token, pings MongoDB and pre-opens the
+embeddings connection concurrently so the first question doesn't pay for them.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from terminal_colors import TerminalColors as tc
+
+# Token scope used by the Azure AI Agents service.
+AGENTS_TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+
+class StartupTimer:
+    """Record named startup milestones relative to a start time."""
+
+    def __init__(self, start: Optional[float] = None) -> None:
+        self.start = start if start is not None else time.perf_counter()
+        self.marks: dict[str, float] = {}
+
+    def mark(self, name: str) -> float:
+        """Record a milestone once and return the elapsed seconds since start."""
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.start
+        return self.marks[name]
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a duration measured independently of the start time."""
+        self.marks[name] = seconds
+
+    def report(self) -> None:
+        """Print the recorded milestones."""
+        timings = ", ".join(f"{name}: {seconds * 1000:.0f}ms" for name, seconds in self.marks.items())
+        print(f"{tc.BRIGHT_BLACK}Startup timings ({timings}){tc.RESET}")
+
+
+class LazyComponents:
+    """Application components built on first access."""
+
+    def __init__(self, project_endpoint: str, credential=None) -> None:
+        """
+        Args:
+            project_endpoint: The Azure AI Foundry project endpoint.
+            credential: Optional async token credential shared by the agents and embeddings
+                clients. Defaults to a `SharedTokenCredential` over `DefaultAzureCredential`.
+        """
+        self.project_endpoint = project_endpoint
+        self._credential = credential
+        self._agents_client = None
+        self._searcher = None
+        self._functions = None
+        self._toolset = None
+        self._budget = None
+
+    @property
+    def credential(self):
+        """The shared credential: one DefaultAzureCredential chain with cached, proactively refreshed tokens."""
+        if self._credential is None:
+            from credential_provider import SharedTokenCredential
+
+            self._credential = SharedTokenCredential()
+        return self._credential
+
+    @property
+    def agents_client(self):
+        """The async AgentsClient."""
+        if self._agents_client is None:
+            from azure.ai.agents.aio import AgentsClient
+
+            self._agents_client = AgentsClient(
+                credential=self.credential,
+                endpoint=self.project_endpoint,
+            )
+        return self._agents_client
+
+    @property
+    def searcher(self):
+        """
+        The MongoDB Atlas hybrid search tool.
+
+        With SEARCH_WORKERS above 1, a `WorkerPool` of search processes sharing one cache tier.
+        """
+        if self._searcher is None:
+            if int(os.getenv("SEARCH_WORKERS", "1")) > 1:
+                from worker_pool import WorkerPool
+
+                self._searcher = WorkerPool.from_env()
+            else:
+                from mongodb_hybridsearch import MongoDBAtlasHybridSearch
+
+                self._searcher = MongoDBAtlasHybridSearch(credential=self.credential)
+        return self._searcher
+
+    @property
+    def functions(self):
+        """The function tool exposing the hybrid search to the agent."""
+        if self._functions is None:
+            from azure.ai.agents.models import AsyncFunctionTool
+
+            self._functions = AsyncFunctionTool(
+                {
+                    self.searcher.async_hybrid_search_mongodb_atlas,
+                }
+            )
+        return self._functions
+
+    @property
+    def toolset(self):
+        """The agent toolset."""
+        if self._toolset is None:
+            from azure.ai.agents.models import AsyncToolSet
+
+            self._toolset = AsyncToolSet()
+        return self._toolset
+
+    @property
+    def budget(self):
+        """The prompt-token budget manager for agent threads."""
+        if self._budget is None:
+            from conversation_budget import ThreadBudgetManager
+
+            self._budget = ThreadBudgetManager.from_env(self.agents_client)
+        return self._budget
+
+    async def warm_up(self) -> None:
+        """
+        Prefetch the credential token, ping MongoDB and run a dummy embed concurrently.
+
+        Failures are reported but not raised; the component is then initialized on first use.
+        """
+        tasks = {
+            "credential token": self.credential.get_token(AGENTS_TOKEN_SCOPE),
+            "MongoDB and embeddings connections": self.searcher.warm_up(),
+        }
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for name, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                print(f"{tc.YELLOW}Warm-up of {name} failed: {result}{tc.RESET}")
+
+    async def report_search_metrics(self) -> None:
+        """Print the numCandidates tuning metrics of the search tool, if it was used."""
+        if self._searcher is None:
+            return
+        try:
+            metrics = await self._searcher.get_metrics()
+        except Exception as e:
+            print(f"{tc.YELLOW}Could not read search metrics: {e}{tc.RESET}")
+            return
+        for worker_metrics in metrics.get("workers", [metrics]):
+            tuning = worker_metrics["tuning"]
+            print(f"{tc.BRIGHT_BLACK}Search tuning: numCandidates={tuning['num_candidates']} "
+                  f"(limit {tuning['limit']}, curve loaded: {tuning['curve_loaded']}), "
+                  f"predicted recall={tuning['predicted_recall']}, measured recall={tuning['measured_recall']}, "
+                  f"latency EWMA={tuning['latency_ms_ewma']}ms, reprobes={tuning['reprobes']}{tc.RESET}")
+
+    async def close(self) -> None:
+        """Close the components that were created."""
+        if self._searcher is not None:
+            await self._searcher.close()
+        if self._agents_client is not None:
+            await self._agents_client.close()
+        if self._credential is not None:
+            await self._credential.close()
@@ -0,0 +1,213 @@
+"""
+Prompt-token budget management for agent threads.
+
+`ThreadBudgetManager` tracks the approximate token weight of each thread's history (user
+messages, answers and tool outputs) with per-turn accounting. Once a thread grows past the
+configured threshold it either limits the run to the most recent messages (`truncate`) or
+rolls over to a fresh thread seeded with a summary of the conversation (`rollover`), so later
+turns don't get slower and costlier as tool outputs accumulate.
+"""
+
+import math
+import os
+from typing import Dict, List, Optional
+
+POLICIES = ("off", "truncate", "rollover")
+
+
+class TurnAccounting:
+    """Token accounting of a single turn, filled in while the run streams."""
+
+    def __init__(self, thread_id: str, user_text: str, chars_per_token: float = 4.0) -> None:
+        self.thread_id = thread_id
+        self.chars_per_token = chars_per_token
+        self.user_chars = len(user_text)
+        self.answer_chars = 0
+        self.tool_output_chars = 0
+        # Usage reported by the service for the run, when available
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        # Extra keyword arguments for runs.stream, e.g. a truncation strategy
+        self.run_options: dict = {}
+
+    def add_answer(self, text: str) -> None:
+        """Account for streamed answer text."""
+        self.answer_chars += len(text or "")
+
+    def add_tool_output(self, output: str) -> None:
+        """Account for a tool output added to the thread."""
+        self.tool_output_chars += len(output or "")
+
+    def set_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        """Record the usage reported by the service for the run."""
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @property
+    def estimated_tokens(self) -> int:
+        """Approximate tokens this turn adds to the thread history."""
+        chars = self.user_chars + self.answer_chars + self.tool_output_chars
+        return math.ceil(chars / self.chars_per_token)
+
+
+class ThreadBudgetManager:
+    """
+    Keep the prompt weight of agent threads under a token threshold.
+
+    Args:
+        agents_client: The AgentsClient (or any object with the same `threads` and `messages` operations).
+        token_threshold: Approximate history tokens above which the policy applies.
+        policy: "truncate" to send only the last messages, "rollover" to continue on a fresh
+            thread seeded with a summary, or "off" to only account.
+        keep_last_messages: Messages kept by "truncate" and quoted in full by the "rollover" summary.
+        summary_max_chars: Maximum size of the rollover summary.
+        chars_per_token: Characters per token used for estimates.
+        report: Print per-turn token accounting.
+    """
+
+    def __init__(self,
+            agents_client,
+            token_threshold: int = 12000,
+            policy: str = "truncate",
+            keep_last_messages: int = 6,
+            summary_max_chars: int = 2000,
+            chars_per_token: float = 4.0,
+            report: bool = False
+        ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown thread budget policy '{policy}', expected one of {POLICIES}.")
+        self.agents_client = agents_client
+        self.token_threshold = token_threshold
+        self.policy = policy
+        self.keep_last_messages = keep_last_messages
+        self.summary_max_chars = summary_max_chars
+        self.chars_per_token = chars_per_token
+        self.report = report
+        # Original thread ID -> current thread ID after rollovers
+        self._current: Dict[str, str] = {}
+        # Thread ID -> estimated tokens of each completed turn
+        self._turn_tokens: Dict[str, List[int]] = {}
+        self.created_thread_ids: List[str] = []
+
+    @classmethod
+    def from_env(cls, agents_client) -> "ThreadBudgetManager":
+        """Create a manager configured from THREAD_* environment variables."""
+        return cls(
+            agents_client,
+            token_threshold=int(os.getenv("THREAD_TOKEN_THRESHOLD", "12000")),
+            policy=os.getenv("THREAD_BUDGET_POLICY", "truncate").lower(),
+            keep_last_messages=int(os.getenv("THREAD_KEEP_LAST_MESSAGES", "6")),
+            summary_max_chars=int(os.getenv("THREAD_SUMMARY_MAX_CHARS", "2000")),
+            report=os.getenv("THREAD_BUDGET_REPORT", "false").lower() in ("1", "true", "yes"),
+        )
+
+    def current_thread_id(self, thread_id: str) -> str:
+        """The thread a conversation currently continues on."""
+        return self._current.get(thread_id, thread_id)
+
+    def history_tokens(self, thread_id: str) -> int:
+        """Approximate cumulative token weight of a thread's history, including truncated turns."""
+        return sum(self._turn_tokens.get(self.current_thread_id(thread_id), []))
+
+    def sent_history_tokens(self, thread_id: str, truncated: bool) -> int:
+        """
+        Approximate token weight of the history the model actually sees.
+
+        With truncation, only the last `keep_last_messages` messages are sent, about one user
+        message and one answer per turn.
+        """
+        turns = self._turn_tokens.get(self.current_thread_id(thread_id), [])
+        if truncated:
+            turns = turns[-math.ceil(self.keep_last_messages / 2):] if self.keep_last_messages > 0 else []
+        return sum(turns)
+
+    async def prepare_turn(self, thread_id: str, content: str) -> TurnAccounting:
+        """
+        Apply the budget policy before a user message is posted.
+
+        Args:
+            thread_id (str): The conversation's original thread ID.
+            content (str): The user message.
+
+        Returns:
+            TurnAccounting: The turn to post on; use its `thread_id` and pass its `run_options`
+                to `runs.stream`.
+        """
+        current = self.current_thread_id(thread_id)
+        over_budget = self.history_tokens(current) > self.token_threshold
+
+        if over_budget and self.policy == "rollover":
+            current = await self._rollover(thread_id, current)
+
+        turn = TurnAccounting(current, content, self.chars_per_token)
+        if over_budget and self.policy == "truncate":
+            from azure.ai.agents.models import TruncationObject
+
+            turn.run_options["truncation_strategy"] = TruncationObject(
+                type="last_messages", last_messages=self.keep_last_messages)
+        return turn
+
+    def complete_turn(self, turn: TurnAccounting) -> None:
+        """Record the weight of a completed turn and report it if enabled."""
+        self._turn_tokens.setdefault(turn.thread_id, []).append(turn.estimated_tokens)
+        if self.report:
+            cumulative = self.history_tokens(turn.thread_id)
+            history = f"thread history ~{cumulative}"
+            if "truncation_strategy" in turn.run_options:
+                sent = self.sent_history_tokens(turn.thread_id, truncated=True)
+                history = f"thread history ~{sent} sent (last {self.keep_last_messages} messages of ~{cumulative} cumulative)"
+            usage = ""
+            if turn.prompt_tokens is not None:
+                usage = f", service usage: {turn.prompt_tokens} prompt / {turn.completion_tokens} completion"
+            print(f"Turn tokens: ~{turn.estimated_tokens} added "
+                  f"(tool outputs ~{math.ceil(turn.tool_output_chars / self.chars_per_token)}), "
+                  f"{history}{usage}")
+
+    async def _rollover(self, thread_id: str, current: str) -> str:
+        """Create a fresh thread seeded with a summary of the current one."""
+        summary = await self._summarize(current)
+        new_thread = await self.agents_client.threads.create()
+        await self.agents_client.messages.create(
+            thread_id=new_thread.id,
+            role="user",
+            content=summary,
+        )
+        self.created_thread_ids.append(new_thread.id)
+        self._current[thread_id] = new_thread.id
+        self._turn_tokens[new_thread.id] = [math.ceil(len(summary) / self.chars_per_token)]
+        if self.report:
+            print(f"Thread history over {self.token_threshold} tokens, continuing on thread {new_thread.id}")
+        return new_thread.id
+
+    async def _summarize(self, thread_id: str) -> str:
+        """
+        Build a summary of a thread from its messages, without tool outputs.
+
+        The last `keep_last_messages` messages are quoted in full (within the size limit),
+        earlier ones are shortened to their first sentence.
+        """
+        messages = []
+        async for message in self.agents_client.messages.list(thread_id=thread_id, order="asc"):
+            text = " ".join(part.text.value for part in message.text_messages).strip()
+            if text:
+                messages.append((getattr(message.role, "value", message.role), text))
+
+        recent = messages[-self.keep_last_messages:] if self.keep_last_messages > 0 else []
+        earlier = messages[:len(messages) - len(recent)]
+        header = "Context from earlier in this conversation (tool outputs omitted):"
+        recent_lines = [f"- {role}: {text}" for role, text in recent]
+        budget = self.summary_max_chars - len(header) - sum(len(line) + 1 for line in recent_lines)
+
+        # Earlier messages are shortened to their first sentence, most recent first while they fit
+        earlier_lines: List[str] = []
+        for role, text in reversed(earlier):
+            line = f"- {role}: {text.split('. ')[0][:200]}"
+            if len(line) + 1 > budget:
+                break
+            earlier_lines.insert(0, line)
+            budget -= len(line) + 1
+
+        summary = "\n".join([header] + earlier_lines + recent_lines)
+        if len(summary) > self.summary_max_chars:
+            summary = summary[:self.summary_max_chars] + "..."
+        return summary
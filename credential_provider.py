@@ -0,0 +1,141 @@
+"""
+Shared Azure credential with per-scope token caching and proactive background refresh.
+
+`SharedTokenCredential` wraps one async credential (by default `DefaultAzureCredential`,
+so the credential chain is walked once) and implements the async `get_token` protocol, so
+it can be passed to both the `AgentsClient` and the embeddings client. Tokens are cached
+per scope and refreshed in the background before they expire, so requests never wait on
+token acquisition once a scope has been fetched.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Scope used by Azure OpenAI / Cognitive Services embeddings deployments.
+COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+
+class SharedTokenCredential:
+    """
+    Async token credential that caches tokens per scope and refreshes them ahead of expiry.
+
+    Args:
+        credential: The async credential to acquire tokens from. Any object with an async
+            `get_token(*scopes, **kwargs)` returning an `AccessToken` works, which makes a
+            fake credential enough for testing. Defaults to `DefaultAzureCredential`.
+        refresh_margin: Seconds before expiry at which a token is refreshed in the background.
+        retry_interval: Seconds between background refresh attempts after a failure.
+        clock: Function returning the current time in seconds since the epoch.
+        sleep: Coroutine function used to wait between background refreshes. Together with
+            `clock`, it lets tests drive the refresh timing without waiting.
+    """
+
+    def __init__(self,
+            credential=None,
+            refresh_margin: float = 600.0,
+            retry_interval: float = 30.0,
+            clock: Callable[[], float] = time.time,
+            sleep: Callable[[float], Awaitable] = asyncio.sleep
+        ) -> None:
+        self._credential = credential
+        self._owns_credential = credential is None
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens: Dict[Tuple, object] = {}
+        self._locks: Dict[Tuple, asyncio.Lock] = {}
+        self._refresh_tasks: Dict[Tuple, asyncio.Task] = {}
+        self.stats = {"hits": 0, "acquisitions": 0, "background_refreshes": 0, "refresh_failures": 0}
+
+    @property
+    def credential(self):
+        """The wrapped credential, created on first use."""
+        if self._credential is None:
+            from azure.identity.aio import DefaultAzureCredential
+
+            self._credential = DefaultAzureCredential()
+        return self._credential
+
+    async def get_token(self, *scopes: str, claims: Optional[str] = None,
+                        tenant_id: Optional[str] = None, **kwargs):
+        """
+        Return a cached token for the scopes, acquiring it on the first request only.
+
+        Requests carrying `claims` (a Continuous Access Evaluation challenge) always go to
+        the wrapped credential, since the cached token was rejected.
+        """
+        if claims:
+            return await self.credential.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+
+        key = (tuple(sorted(scopes)), tenant_id)
+        token = self._tokens.get(key)
+        if token is not None and token.expires_on > self._clock():
+            self.stats["hits"] += 1
+            return token
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another request may have acquired the token while this one waited
+            token = self._tokens.get(key)
+            if token is not None and token.expires_on > self._clock():
+                self.stats["hits"] += 1
+                return token
+            token = await self._acquire(key)
+
+        self._schedule_refresh(key)
+        return token
+
+    async def prefetch(self, *scopes: str) -> None:
+        """Acquire and cache a token for the scopes ahead of the first request."""
+        await self.get_token(*scopes)
+
+    async def _acquire(self, key: Tuple):
+        """Acquire a token from the wrapped credential and cache it."""
+        scopes, tenant_id = key
+        kwargs = {"tenant_id": tenant_id} if tenant_id else {}
+        token = await self.credential.get_token(*scopes, **kwargs)
+        self.stats["acquisitions"] += 1
+        self._tokens[key] = token
+        return token
+
+    def _schedule_refresh(self, key: Tuple) -> None:
+        """Start the background refresh loop for a scope if it isn't running."""
+        task = self._refresh_tasks.get(key)
+        if task is None or task.done():
+            self._refresh_tasks[key] = asyncio.create_task(self._refresh_loop(key))
+
+    async def _refresh_loop(self, key: Tuple) -> None:
+        """Refresh the token for a scope `refresh_margin` seconds before it expires."""
+        while True:
+            token = self._tokens.get(key)
+            if token is None:
+                return
+            delay = token.expires_on - self.refresh_margin - self._clock()
+            # Short-lived tokens would otherwise be refreshed in a tight loop
+            await self._sleep(max(delay, self.retry_interval))
+            try:
+                async with self._locks[key]:
+                    await self._acquire(key)
+                self.stats["background_refreshes"] += 1
+            except Exception as e:
+                self.stats["refresh_failures"] += 1
+                print(f"Background token refresh failed, retrying in {self.retry_interval:.0f}s: {e}")
+
+    async def close(self) -> None:
+        """Stop the background refreshes and close the wrapped credential if it was created here."""
+        for task in self._refresh_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._refresh_tasks.values(), return_exceptions=True)
+        self._refresh_tasks.clear()
+        self._tokens.clear()
+        if self._owns_credential and self._credential is not None:
+            await self._credential.close()
+            self._credential = None
+
+    async def __aenter__(self) -> "SharedTokenCredential":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
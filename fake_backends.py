@@ -0,0 +1,147 @@
+"""
+Fake MongoDB Atlas and Azure AI embeddings backends for benchmarks and replays.
+
+`fake_searcher_factory` builds a `MongoDBAtlasHybridSearch` whose collection and embeddings
+client are replaced by in-memory fakes with configurable latencies, so the search tool's own
+CPU work (projection, truncation, rerank, compaction, JSON serialization) runs unchanged
+without any Azure or MongoDB account.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import List
+
+WORDS = (
+    "tent sleeping bag backpack stove boots jacket lantern kayak camping hiking outdoor waterproof "
+    "lightweight durable compact family premium trail summit river forest shelter warm dry breathable "
+    "aluminium poles vestibule rainfly zipper seam pocket strap buckle sole ankle support warranty"
+).split()
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+
+
+class _EmbeddingItem:
+    def __init__(self, embedding: List[float]) -> None:
+        self.embedding = embedding
+
+
+class _EmbeddingsResult:
+    def __init__(self, embeddings: List[List[float]]) -> None:
+        self.data = [_EmbeddingItem(embedding) for embedding in embeddings]
+
+
+class FakeEmbeddingsClient:
+    """Async embeddings client returning deterministic vectors after a simulated network latency."""
+
+    def __init__(self, latency_ms: float = 40.0, dimensions: int = 1536) -> None:
+        self.latency_ms = latency_ms
+        self.dimensions = dimensions
+        self.calls = 0
+
+    async def embed(self, input: List[str]) -> _EmbeddingsResult:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        embeddings = []
+        for text in input:
+            rng = random.Random(_seed(text))
+            embeddings.append([rng.uniform(-1, 1) for _ in range(self.dimensions)])
+        return _EmbeddingsResult(embeddings)
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeCollection:
+    """
+    Collection whose `aggregate` blocks like pymongo and returns deterministic documents.
+
+    `latency_ms` is spent waiting, like a network round trip; `cpu_ms` is spent computing while
+    holding the GIL, like pymongo decoding the BSON reply. Documents have `content` of
+    `content_chars` characters and an 8-dimensional embedding.
+    """
+
+    def __init__(self, latency_ms: float = 25.0, content_chars: int = 3000, corpus_size: int = 500,
+                 cpu_ms: float = 0.0) -> None:
+        self.latency_ms = latency_ms
+        self.cpu_ms = cpu_ms
+        self.content_chars = content_chars
+        self.corpus_size = corpus_size
+        self.calls = 0
+
+    def _limit_and_seed(self, pipeline: List[dict]):
+        """Find the result limit and the query of a search pipeline."""
+        limit, seed_text = 5, ""
+        for stage in pipeline:
+            if "$limit" in stage:
+                limit = stage["$limit"]
+            search = stage.get("$vectorSearch")
+            if search is None and "$rankFusion" in stage:
+                search = stage["$rankFusion"]["input"]["pipelines"]["vectorPipeline"][0]["$vectorSearch"]
+            if search is not None:
+                limit = search["limit"]
+                seed_text = str(search["queryVector"][:4])
+        return limit, seed_text
+
+    def _document(self, index: int) -> dict:
+        rng = random.Random(index)
+        words = []
+        length = 0
+        while length < self.content_chars:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return {
+            "_id": f"doc{index:05d}",
+            "content": " ".join(words)[:self.content_chars],
+            "embedding": [rng.uniform(-1, 1) for _ in range(8)],
+        }
+
+    def aggregate(self, pipeline: List[dict]) -> List[dict]:
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        deadline = time.thread_time() + self.cpu_ms / 1000
+        while time.thread_time() < deadline:
+            pass
+        limit, seed_text = self._limit_and_seed(pipeline)
+        rng = random.Random(_seed(seed_text))
+        indexes = rng.sample(range(self.corpus_size), min(limit, self.corpus_size))
+
+        projection = next((stage["$project"] for stage in pipeline if "$project" in stage), None)
+        results = []
+        for rank, index in enumerate(indexes):
+            doc = self._document(index)
+            doc["_score"] = round(1.0 / (rank + 1), 4)
+            if projection:
+                doc = {key: value for key, value in doc.items() if key in projection or key == "_id"}
+            results.append(doc)
+        return results
+
+
+def fake_searcher_factory(cache=None, credential=None):
+    """
+    Build a `MongoDBAtlasHybridSearch` backed by the fakes.
+
+    Latencies are read from FAKE_EMBEDDING_LATENCY_MS (default 40) and FAKE_SEARCH_LATENCY_MS
+    (default 25), and the CPU time of each search from FAKE_SEARCH_CPU_MS (default 0).
+    """
+    os.environ.setdefault("AZURE_AI_EMBEDDINGS_ENDPOINT", "https://fake.embeddings.local")
+    os.environ.setdefault("AZURE_AI_EMBEDDINGS_KEY", "fake-key")
+
+    from mongodb_hybridsearch import MongoDBAtlasHybridSearch
+
+    searcher = MongoDBAtlasHybridSearch(credential=credential, cache=cache)
+    searcher._collection = FakeCollection(latency_ms=float(os.getenv("FAKE_SEARCH_LATENCY_MS", "25")),
+                                          cpu_ms=float(os.getenv("FAKE_SEARCH_CPU_MS", "0")))
+    searcher._embeddings_client = FakeEmbeddingsClient(latency_ms=float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "40")))
+    # The fake collection has no MongoDB client to ping
+    searcher.ping = _no_ping
+    return searcher
+
+
+async def _no_ping() -> None:
+    pass
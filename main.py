@@ -1,21 +1,22 @@
+from __future__ import annotations
+
+import time
+
+_START = time.perf_counter()
+
 import asyncio
 import logging
 import os
+from typing import TYPE_CHECKING
 
-from azure.ai.agents.aio import AgentsClient
-from azure.ai.agents.models import (
-    Agent,
-    AgentThread,
-    AsyncFunctionTool,
-    AsyncToolSet,
-)
-from azure.identity.aio import DefaultAzureCredential
 from dotenv import load_dotenv
 
-from stream_event_handler import StreamEventHandler
+from components import LazyComponents, StartupTimer
 from terminal_colors import TerminalColors as tc
 from utilities import Utilities
-from mongodb_hybridsearch import MongoDBAtlasHybridSearch
+
+if TYPE_CHECKING:
+    from azure.ai.agents.models import Agent, AgentThread
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
@@ -36,20 +37,11 @@ TEMPERATURE = 0.1
 TOP_P = 0.1
 INSTRUCTIONS_FILE = None
 
-toolset = AsyncToolSet()
 utilities = Utilities()
-_mongoDBAtlasHybridSearch = MongoDBAtlasHybridSearch()
-
-agents_client = AgentsClient(
-    credential=DefaultAzureCredential(),
-    endpoint=PROJECT_ENDPOINT,
-)
-
-functions = AsyncFunctionTool(
-    {
-        _mongoDBAtlasHybridSearch.async_hybrid_search_mongodb_atlas,
-    }
-)
+# The Azure clients and the MongoDB search tool are created on first use, see components.py
+components = LazyComponents(project_endpoint=PROJECT_ENDPOINT)
+startup = StartupTimer(_START)
+startup.mark("import")
 
 INSTRUCTIONS_FILE = "instructions/function_calling.txt"
 
@@ -57,7 +49,7 @@ async def add_agent_tools() -> None:
     """Add tools for the agent."""
 
     # Add the functions tool
-    toolset.add(functions)
+    components.toolset.add(components.functions)
 
 async def initialize() -> tuple[Agent, AgentThread]:
     """Initialize the agent with the sales data schema and instructions."""
@@ -66,6 +58,8 @@ async def initialize() -> tuple[Agent, AgentThread]:
         return None, None
 
     font_file_info = await add_agent_tools()
+    agents_client = components.agents_client
+    toolset = components.toolset
 
     try:
         instructions = utilities.load_instructions(INSTRUCTIONS_FILE)
@@ -104,32 +98,42 @@ async def initialize() -> tuple[Agent, AgentThread]:
 
 async def cleanup(agent: Agent, thread: AgentThread) -> None:
     """Cleanup the resources."""
-    await agents_client.threads.delete(thread.id)
-    await agents_client.delete_agent(agent.id)
-    await _mongoDBAtlasHybridSearch.close()
+    await components.agents_client.threads.delete(thread.id)
+    for thread_id in components.budget.created_thread_ids:
+        await components.agents_client.threads.delete(thread_id)
+    await components.agents_client.delete_agent(agent.id)
 
 async def post_message(thread_id: str, content: str, agent: Agent, thread: AgentThread) -> None:
     """Post a message to the Foundry Agent Service."""
+    from stream_event_handler import StreamEventHandler
+
+    agents_client = components.agents_client
     try:
+        # Keep the thread history under the prompt-token budget, possibly on a fresh thread
+        turn = await components.budget.prepare_turn(thread_id, content)
+
         await agents_client.messages.create(
-            thread_id=thread_id,
+            thread_id=turn.thread_id,
             role="user",
             content=content,
         )
 
         async with await agents_client.runs.stream(
-            thread_id=thread.id,
+            thread_id=turn.thread_id,
             agent_id=agent.id,
             event_handler=StreamEventHandler(
-                functions=functions, project_client=agents_client, utilities=utilities),
+                functions=components.functions, project_client=agents_client, utilities=utilities, turn=turn),
             max_completion_tokens=MAX_COMPLETION_TOKENS,
             max_prompt_tokens=MAX_PROMPT_TOKENS,
             temperature=TEMPERATURE,
             top_p=TOP_P,
             instructions=agent.instructions,
+            **turn.run_options,
         ) as stream:
             await stream.until_done()
 
+        components.budget.complete_turn(turn)
+
     except Exception as e:
         utilities.log_msg_purple(
             f"An error occurred posting the message: {e!s}")
@@ -139,14 +143,18 @@ async def main() -> None:
     """
     Example questions: Sales by region, top-selling products, total shipping costs by region, show as a pie chart.
     """
-    async with agents_client:
-        agent, thread = await initialize()
+    try:
+        # Warm up the credential, MongoDB and embeddings connections while the agent is created
+        initialized, _ = await asyncio.gather(initialize(), components.warm_up())
+        agent, thread = initialized or (None, None)
+        startup.mark("ready")
         if not agent or not thread:
             print(f"{tc.BG_BRIGHT_RED}Initialization failed. Ensure you have uncommented the instructions file for the lab.{tc.RESET}")
             print("Exiting...")
             return
 
         cmd = None
+        first_answer = True
 
         while True:
             prompt = input(
@@ -158,7 +166,13 @@ async def main() -> None:
             if cmd in {"exit", "save"}:
                 break
 
+            turn_start = time.perf_counter()
             await post_message(agent=agent, thread_id=thread.id, content=prompt, thread=thread)
+            if first_answer:
+                first_answer = False
+                startup.record("first answer", time.perf_counter() - turn_start)
+                print()
+                startup.report()
 
         if cmd == "save":
             print("The agent has not been deleted, so you can continue experimenting with it in the Azure AI Foundry.")
@@ -168,6 +182,9 @@ async def main() -> None:
         else:
             await cleanup(agent, thread)
             print("The agent resources have been cleaned up.")
+    finally:
+        await components.report_search_metrics()
+        await components.close()
 
 
 if __name__ == "__main__":
@@ -1,18 +1,34 @@
 from typing import Optional, List
+import asyncio
+import json
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
-from azure.ai.inference import EmbeddingsClient
-from azure.identity import DefaultAzureCredential
-from azure.core.credentials import AzureKeyCredential
-from pymongo.server_api import ServerApi
+import time
+
+from credential_provider import COGNITIVE_SERVICES_SCOPE, SharedTokenCredential
+from reranker import LightweightReranker
+from result_compaction import ResultCompactor
+from request_log import RequestRecorder
+from search_cache import LocalCache, cache_key
+from search_tuning import NumCandidatesTuner
 
 class MongoDBAtlasHybridSearch:
     """
     Class to perform hybrid search on MongoDB Atlas using Azure AI Foundry embeddings.
+
+    The MongoDB client and the embeddings client are created on first use, so constructing
+    the searcher does not import pymongo or the Azure SDK nor open any connection.
+    Call `warm_up()` to open both connections ahead of the first query.
     """
 
-    def __init__(self):
+    def __init__(self, credential=None, cache=None):
+        """
+        Args:
+            credential: Optional async token credential used for the embeddings service when
+                AZURE_AI_EMBEDDINGS_KEY is not set, typically the application's shared
+                `SharedTokenCredential`. A private one is created if omitted.
+            cache: Optional cache for query embeddings and search results, for example a
+                `SharedCacheClient` shared by worker processes. An in-process `LocalCache` by default.
+        """
         self.mongo_uri = str(os.getenv("MONGODB_ATLAS_URI"))
         self.db_name = str(os.getenv("MONGODB_ATLAS_DATABASE"))
         self.coll_name = str(os.getenv("MONGODB_ATLAS_COLLECTION"))
@@ -21,15 +37,189 @@ class MongoDBAtlasHybridSearch:
         self.vectorindex_path = str(os.getenv("MONGODB_ATLAS_VECTORINDEX_PATH", "embedding"))
         self.fulltextindex_path = str(os.getenv("MONGODB_ATLAS_FULLTEXTINDEX_PATH", "content"))
         self.endpoint = str(os.environ["AZURE_AI_EMBEDDINGS_ENDPOINT"])
-        self.key = str(os.environ["AZURE_AI_EMBEDDINGS_KEY"])
-        
-        self.client = MongoClient(self.mongo_uri, server_api=ServerApi('1'))
-        self.db = self.client[self.db_name]
-        self.collection = self.db[self.coll_name]
+        # Key authentication is used when a key is set, Microsoft Entra ID (AAD) otherwise
+        self.key = os.getenv("AZURE_AI_EMBEDDINGS_KEY", "")
+        self.embeddings_scope = os.getenv("AZURE_AI_EMBEDDINGS_SCOPE", COGNITIVE_SERVICES_SCOPE)
+        self.credential = credential
+        self._owns_credential = False
+        self.max_limit = int(os.getenv("MONGODB_ATLAS_MAX_LIMIT", "5"))
+        self.tuner = NumCandidatesTuner.from_env()
+        self.max_output_kb = 400
+        # Optional local rerank stage: over-fetch candidates, rerank and pack into the size budget
+        self.rerank_overfetch = int(os.getenv("MONGODB_ATLAS_RERANK_OVERFETCH", "4"))
+        self.reranker = None
+        if os.getenv("MONGODB_ATLAS_RERANK", "false").lower() in ("1", "true", "yes"):
+            self.reranker = LightweightReranker.from_env()
+        # Optional compaction stage: drop near-duplicate passages and keep query-term windows
+        self.compactor = None
+        if os.getenv("MONGODB_ATLAS_COMPACT", "false").lower() in ("1", "true", "yes"):
+            self.compactor = ResultCompactor.from_env(content_field=self.fulltextindex_path)
+        # Return results as compact columnar JSON ({"fields": [...], "rows": [...]})
+        self.columnar_output = os.getenv("MONGODB_ATLAS_COLUMNAR_OUTPUT", "false").lower() in ("1", "true", "yes")
+        # Embedding and result caches
+        self.cache = cache if cache is not None else LocalCache.from_env()
+        self.embedding_cache_ttl = float(os.getenv("SEARCH_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+        # Result caching is off by default in a single process, so a search sees fresh data; worker
+        # processes (SEARCH_WORKERS above 1) share results for 60 seconds by default
+        default_result_ttl = "60" if int(os.getenv("SEARCH_WORKERS", "1")) > 1 else "0"
+        self.result_cache_ttl = float(os.getenv("SEARCH_RESULT_CACHE_TTL_SECONDS", default_result_ttl))
+        # Record tool invocations to JSONL for replay (see replay.py)
+        self.recorder = RequestRecorder.from_env()
+
+        self._client = None
+        self._collection = None
+        self._embeddings_client = None
+
+    @property
+    def client(self):
+        """The MongoClient, created on first use."""
+        if self._client is None:
+            from pymongo import MongoClient
+            from pymongo.server_api import ServerApi
+
+            self._client = MongoClient(self.mongo_uri, server_api=ServerApi('1'))
+        return self._client
+
+    @property
+    def db(self):
+        """The MongoDB database."""
+        return self.client[self.db_name]
+
+    @property
+    def collection(self):
+        """The MongoDB collection holding the documents and search indexes."""
+        if self._collection is None:
+            self._collection = self.db[self.coll_name]
+        return self._collection
+
+    @property
+    def embeddings_client(self):
+        """The async Azure AI embeddings client, created on first use and reused across calls."""
+        if self._embeddings_client is None:
+            from azure.ai.inference.aio import EmbeddingsClient
+
+            if self.key:
+                from azure.core.credentials import AzureKeyCredential
+
+                self._embeddings_client = EmbeddingsClient(
+                    endpoint=self.endpoint, credential=AzureKeyCredential(self.key))
+            else:
+                if self.credential is None:
+                    self.credential = SharedTokenCredential()
+                    self._owns_credential = True
+                self._embeddings_client = EmbeddingsClient(
+                    endpoint=self.endpoint, credential=self.credential,
+                    credential_scopes=[self.embeddings_scope])
+        return self._embeddings_client
+
+    async def ping(self) -> None:
+        """Ping MongoDB Atlas, opening the connection pool."""
+        await asyncio.to_thread(self.client.admin.command, "ping")
+
+    async def warm_up(self) -> None:
+        """Open the MongoDB and embeddings connections concurrently and run a dummy embed."""
+        await asyncio.gather(self.ping(), self.get_embedding("warm-up"))
 
     async def close(self) -> None:
         """Close the MongoDB connection."""
-        self.client.close()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+            self._collection = None
+        if self._embeddings_client is not None:
+            await self._embeddings_client.close()
+            self._embeddings_client = None
+        if self._owns_credential:
+            await self.credential.close()
+            self.credential = None
+            self._owns_credential = False
+        if self.reranker:
+            self.reranker.close()
+        if self.compactor:
+            self.compactor.close()
+        if self.recorder:
+            self.recorder.close()
+
+    async def get_metrics(self) -> dict:
+        """Return the current search metrics (chosen numCandidates, recall and latency, cache counters)."""
+        return {"tuning": dict(self.tuner.metrics), "cache": self.cache.stats()}
+
+    def _vector_search_stage(self, embedding_vector: List[float], limit: int) -> dict:
+        """Build the $vectorSearch stage with a numCandidates chosen by the tuner."""
+        return {
+            "$vectorSearch": {
+                "index": self.vector_index_name,
+                "path": self.vectorindex_path,
+                "queryVector": embedding_vector,
+                "numCandidates": self.tuner.choose(limit),
+                "limit": limit
+            }
+        }
+
+    async def _aggregate(self, pipeline: List[dict], num_candidates: int) -> List[dict]:
+        """
+        Run an aggregation and feed its end-to-end latency back to the numCandidates tuner.
+
+        pymongo blocks, so the aggregation runs in a thread and the event loop keeps serving
+        other searches meanwhile. The latency covers the whole pipeline, so the tuner compares
+        it against its pipeline SLO rather than the offline `$vectorSearch` measurements.
+
+        Args:
+            pipeline: The aggregation pipeline
+            num_candidates: The numCandidates of the pipeline's `$vectorSearch` stage
+        """
+        start = time.perf_counter()
+        collection = self.collection
+        results = await asyncio.to_thread(lambda: list(collection.aggregate(pipeline)))
+        self.tuner.observe(num_candidates, (time.perf_counter() - start) * 1000)
+        return results
+
+    async def _postprocess(self, results: List[dict], search_content: str,
+                           embedding_vector: List[float], limit: int) -> List[dict]:
+        """
+        Truncate large text fields, optionally rerank and compact, and fit the results under the size limit.
+
+        Args:
+            results: Documents returned by the search pipeline
+            search_content: The search text
+            embedding_vector: The query embedding
+            limit: Number of results to return
+
+        Returns:
+            List of documents ready to be returned as tool output
+        """
+        # Further truncate large fields if they exist
+        cleaned_results = []
+        for doc in results:
+            clean_doc = {}
+            for key, value in doc.items():
+                if self.compactor and key == self.fulltextindex_path:
+                    # The compaction stage keeps the query-relevant windows instead of the prefix
+                    clean_doc[key] = value
+                elif isinstance(value, str) and len(value) > 500:
+                    # Truncate large text fields
+                    clean_doc[key] = value[:500] + "..."
+                else:
+                    clean_doc[key] = value
+            cleaned_results.append(clean_doc)
+
+        if self.reranker:
+            cleaned_results = await self.reranker.arerank(
+                search_content, embedding_vector, cleaned_results,
+                content_field=self.fulltextindex_path, embedding_field=self.vectorindex_path)
+
+        if self.compactor:
+            cleaned_results = await self.compactor.acompact(cleaned_results, search_content)
+
+        if self.reranker:
+            # Keep the most relevant documents that fit, instead of the first ones
+            cleaned_results = self.reranker.pack(
+                cleaned_results, self.max_output_kb * 1024, limit, content_field=self.fulltextindex_path)
+        else:
+            cleaned_results = cleaned_results[:limit]
+
+        # Ensure results fit within size limit
+        return self._estimate_size_and_truncate(cleaned_results, self.max_output_kb)
     
     def _estimate_size_and_truncate(self, results: List[dict], max_size_kb: int = 400) -> List[dict]:
         """
@@ -112,14 +302,19 @@ class MongoDBAtlasHybridSearch:
             print("Set them before running this sample.")
             raise RuntimeError("Required Azure AI Embeddings environment variables are missing.")
  """
+        key = cache_key("embedding", self.endpoint, text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
         # [START embeddings]
-        
-        client = EmbeddingsClient(endpoint=self.endpoint, credential=AzureKeyCredential(self.key))
 
-        response = client.embed(input=[text])
+        response = await self.embeddings_client.embed(input=[text])
         # Get the first (and only) embedding vector as a flat list
         if response.data and len(response.data) > 0:
-            return response.data[0].embedding
+            embedding = list(response.data[0].embedding)
+            self.cache.set(key, embedding, self.embedding_cache_ttl)
+            return embedding
         else:
             raise RuntimeError("No embedding returned from Azure AI service")
 
@@ -136,18 +331,54 @@ class MongoDBAtlasHybridSearch:
 
         Args:
             search_content (str): The content to search for (text or embedding).
-            limit (int): Maximum number of results to return (default: 3, max: 5)
+            limit (int): Maximum number of results to return (default: 3, max: MONGODB_ATLAS_MAX_LIMIT, 5 if unset)
             include_fields (list): List of fields to include in results (reduces output size)
 
         Returns:
             list: List of matching documents with limited fields to stay under 512KB limit.
+                  With MONGODB_ATLAS_COLUMNAR_OUTPUT enabled, a compact JSON string of the
+                  shape {"fields": [...], "rows": [[...], ...]} instead.
         """
+        if self.recorder is None:
+            return await self._hybrid_search(search_content, limit, include_fields, {})
+
+        info = {"cache_hit": False, "error": None}
+        timestamp = time.time()
+        start = time.perf_counter()
+        results = await self._hybrid_search(search_content, limit, include_fields, info)
+        self.recorder.record(
+            search_content, limit, include_fields, timestamp,
+            duration_ms=(time.perf_counter() - start) * 1000,
+            results=results,
+            cache_hit=info["cache_hit"],
+            error=info["error"],
+        )
+        return results
+
+    async def _hybrid_search(self, search_content: str, limit: int,
+                             include_fields: Optional[List[str]], info: dict):
+        """
+        Run the hybrid search behind `async_hybrid_search_mongodb_atlas`.
+
+        `info["cache_hit"]` is set when the results come from the result cache, and `info["error"]`
+        when a backend error was caught and no results are returned.
+        """
+        from pymongo.errors import ConnectionFailure
+
         # Enforce maximum limit to prevent large outputs
-        limit = min(limit, 5)
+        limit = min(limit, self.max_limit)
         
         # Default fields to include (excluding large fields like embeddings and full content)
         if include_fields is None:
             include_fields = ["_id", "content"]
+
+        result_key = cache_key("search", self.coll_name, search_content, limit, include_fields)
+        if self.result_cache_ttl > 0:
+            cached_results = self.cache.get(result_key)
+            if cached_results is not None:
+                info["cache_hit"] = True
+                return cached_results
+
         # Get MongoDB Atlas connection string from environment variable
         #mongo_uri = os.getenv("MONGODB_ATLAS_URI")
         #if not mongo_uri:
@@ -178,23 +409,23 @@ class MongoDBAtlasHybridSearch:
                 # If it's a list of lists, take the first embedding
                 embedding_vector = embedding_vector[0]
 
+            # Over-fetch candidates for the rerank and compaction stages
+            fetch_limit = limit
+            if self.reranker:
+                fetch_limit = max(limit, min(limit * self.rerank_overfetch, self.reranker.max_candidates))
+            elif self.compactor:
+                fetch_limit = limit * self.compactor.overfetch
+
             # Try hybrid search with $rankFusion first
             try:
+                vector_stage = self._vector_search_stage(embedding_vector, fetch_limit)
                 pipeline = [
                     {
                         "$rankFusion": {
                             "input": {
                                 "pipelines": {
                                     "vectorPipeline": [
-                                        {
-                                            "$vectorSearch": {
-                                                "index": self.vector_index_name,
-                                                "path": self.vectorindex_path,
-                                                "queryVector": embedding_vector,
-                                                "numCandidates": 50,
-                                                "limit": limit
-                                            }
-                                        }
+                                        vector_stage
                                     ],
                                     "fullTextPipeline": [
                                         {
@@ -206,7 +437,7 @@ class MongoDBAtlasHybridSearch:
                                                 }
                                             }
                                         },
-                                        { "$limit": limit }
+                                        { "$limit": fetch_limit }
                                     ]
                                 }
                             },
@@ -220,7 +451,7 @@ class MongoDBAtlasHybridSearch:
                         }
                     },
                     {
-                        "$limit": limit
+                        "$limit": fetch_limit
                     }
                 ]
 
@@ -229,40 +460,20 @@ class MongoDBAtlasHybridSearch:
                 for field in include_fields:
                     projection[field] = 1
                 projection["_score"] = 1  # Include search score
+                if self.reranker:
+                    projection[self.vectorindex_path] = 1  # Needed for rerank, removed from the output
                 pipeline.append({"$project": projection})
 
-                results = list(self.collection.aggregate(pipeline))
-                
-                # Further truncate large fields if they exist
-                cleaned_results = []
-                for doc in results:
-                    clean_doc = {}
-                    for key, value in doc.items():
-                        if isinstance(value, str) and len(value) > 500:
-                            # Truncate large text fields
-                            clean_doc[key] = value[:500] + "..."
-                        else:
-                            clean_doc[key] = value
-                    cleaned_results.append(clean_doc)
-                
-                # Ensure results fit within size limit
-                return self._estimate_size_and_truncate(cleaned_results)
+                results = await self._aggregate(pipeline, vector_stage["$vectorSearch"]["numCandidates"])
                 
             except Exception as rank_fusion_error:
                 print(f"$rankFusion failed (likely due to MongoDB version or index configuration): {rank_fusion_error}")
                 print("Falling back to vector search only...")
                 
                 # Fallback to vector search only
+                vector_stage = self._vector_search_stage(embedding_vector, fetch_limit)
                 fallback_pipeline = [
-                    {
-                        "$vectorSearch": {
-                            "index": self.vector_index_name,
-                            "path": self.vectorindex_path,
-                            "queryVector": embedding_vector,
-                            "numCandidates": 50,
-                            "limit": limit
-                        }
-                    }
+                    vector_stage
                 ]
                 
                 # Add field projection to reduce document size
@@ -270,35 +481,29 @@ class MongoDBAtlasHybridSearch:
                 for field in include_fields:
                     projection[field] = 1
                 projection["score"] = {"$meta": "vectorSearchScore"}  # Include vector search score
+                if self.reranker:
+                    projection[self.vectorindex_path] = 1  # Needed for rerank, removed from the output
                 fallback_pipeline.append({"$project": projection})
                 
-                results = list(self.collection.aggregate(fallback_pipeline))
-                
-                # Further truncate large fields if they exist
-                cleaned_results = []
-                for doc in results:
-                    clean_doc = {}
-                    for key, value in doc.items():
-                        if isinstance(value, str) and len(value) > 500:
-                            # Truncate large text fields
-                            clean_doc[key] = value[:500] + "..."
-                        else:
-                            clean_doc[key] = value
-                    cleaned_results.append(clean_doc)
-                
-                # Ensure results fit within size limit
-                return self._estimate_size_and_truncate(cleaned_results)
+                results = await self._aggregate(fallback_pipeline, vector_stage["$vectorSearch"]["numCandidates"])
+
+            final_results = await self._postprocess(results, search_content, embedding_vector, limit)
+            if self.columnar_output:
+                final_results = json.dumps(ResultCompactor.to_columnar(final_results), default=str, separators=(",", ":"))
+            if self.result_cache_ttl > 0:
+                self.cache.set(result_key, final_results, self.result_cache_ttl)
+            return final_results
         except ConnectionFailure as e:
             print(f"Could not connect to MongoDB Atlas: {e}")
+            info["error"] = f"{type(e).__name__}: {e}"
             return []
         except Exception as e:
             print(f"Error in hybrid_search_mongodb_atlas: {e}")
+            info["error"] = f"{type(e).__name__}: {e}"
             return []
 
 
 # Example usage:
-import asyncio
-
 if __name__ == "__main__":
     # Set your MongoDB Atlas URI in the environment variable before running
     # os.environ["MONGODB_ATLAS_URI"] = "your-mongodb-atlas-uri"
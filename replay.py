@@ -0,0 +1,279 @@
+"""
+Replay recorded search tool invocations as a load test.
+
+Record production traffic by setting SEARCH_RECORD_FILE (see `request_log.py`), then replay it
+against the search tool with fake or live backends:
+
+    python replay.py search_requests.jsonl                        # original rate, fake backends
+    python replay.py search_requests.jsonl --rate scaled --speed 4
+    python replay.py search_requests.jsonl --rate max --concurrency 32 --workers 4
+    python replay.py search_requests.jsonl --backend live --report report.json
+
+A synthetic workload in the same format can be generated with:
+
+    python replay.py --generate 500 --qps 20 --repeat 0.3 search_requests.jsonl
+
+The report covers throughput, latency percentiles, scheduling lag, cache hit rates, empty
+results and the distribution of tool output sizes. Latency is measured from the time a request
+was scheduled, not from when it actually started, so a replayer that falls behind shows up in
+the percentiles instead of hiding the queueing delay (coordinated omission). The search tool
+returns no results on backend errors, so empty results are counted separately, next to the
+errors recorded in the log.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import List, Optional
+
+from request_log import load_requests, output_size, result_count
+
+# Cache key prefixes of the searcher's caches, reported separately.
+CACHES = {"embedding": "embedding", "result": "search"}
+# Upper bounds (KB) of the output size histogram buckets.
+SIZE_BUCKETS_KB = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def build_searcher(backend: str, workers: int):
+    """Create the searcher (or worker pool) to replay against."""
+    if backend == "live":
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        from worker_pool import default_searcher_factory as factory
+    else:
+        from fake_backends import fake_searcher_factory as factory
+
+    if workers > 1:
+        from worker_pool import WorkerPool
+
+        return WorkerPool(num_workers=workers, searcher_factory=factory)
+    return factory()
+
+
+async def get_cache_stats(searcher) -> dict:
+    """Hits and misses of the embedding and result caches, summed over workers for a worker pool."""
+    metrics = await searcher.get_metrics()
+    caches = [worker["cache"] for worker in metrics["workers"]] if "workers" in metrics else [metrics["cache"]]
+    stats = {}
+    for name, prefix in CACHES.items():
+        counts = [cache.get("by_prefix", {}).get(prefix, {}) for cache in caches]
+        stats[name] = {
+            "hits": sum(count.get("hits", 0) for count in counts),
+            "misses": sum(count.get("misses", 0) for count in counts),
+        }
+    return stats
+
+
+async def replay(requests: List[dict], searcher, rate: str = "original", speed: float = 1.0,
+                 concurrency: int = 16) -> List[dict]:
+    """
+    Replay requests against the searcher.
+
+    Args:
+        requests (list): Recorded invocations, sorted by timestamp.
+        searcher: Object with `async_hybrid_search_mongodb_atlas`.
+        rate (str): "original" keeps the recorded inter-arrival times, "scaled" divides them
+            by `speed`, "max" sends requests as fast as `concurrency` allows.
+        speed (float): Speed-up factor for "scaled".
+        concurrency (int): Requests in flight for "max".
+
+    Returns:
+        list: One sample per request with latency (from the scheduled time), service time (from
+            the actual start), scheduling lag, output size, result count and error.
+    """
+    samples = []
+
+    async def one(record: dict, scheduled: float) -> None:
+        start = time.perf_counter()
+        sample = {"lag_ms": (start - scheduled) * 1000, "error": None, "output_bytes": 0, "result_count": None}
+        try:
+            results = await searcher.async_hybrid_search_mongodb_atlas(
+                record["query"], limit=record["limit"], include_fields=record["include_fields"])
+            sample["output_bytes"] = output_size(results)
+            sample["result_count"] = result_count(results)
+        except Exception as e:
+            sample["error"] = f"{type(e).__name__}: {e}"
+        end = time.perf_counter()
+        sample["latency_ms"] = (end - scheduled) * 1000
+        sample["service_ms"] = (end - start) * 1000
+        samples.append(sample)
+
+    if rate == "max":
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(record: dict) -> None:
+            async with semaphore:
+                await one(record, time.perf_counter())
+
+        await asyncio.gather(*(bounded(record) for record in requests))
+        return samples
+
+    if rate == "original":
+        speed = 1.0
+    first_ts = requests[0]["ts"] if requests else 0.0
+    origin = time.perf_counter()
+    tasks = []
+    for record in requests:
+        scheduled = origin + (record["ts"] - first_ts) / speed
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(record, scheduled)))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def summarize(samples: List[dict], elapsed: float, cache_before: dict, cache_after: dict,
+              requests: List[dict]) -> dict:
+    """Build the replay report."""
+    ok = [sample for sample in samples if sample["error"] is None]
+    latencies = [sample["latency_ms"] for sample in ok]
+    service_times = [sample["service_ms"] for sample in ok]
+    sizes = [sample["output_bytes"] for sample in ok]
+    cache = {}
+    for name in CACHES:
+        hits = cache_after[name]["hits"] - cache_before[name]["hits"]
+        lookups = hits + cache_after[name]["misses"] - cache_before[name]["misses"]
+        cache[name] = {"lookups": lookups, "hits": hits, "hit_rate": round(hits / lookups, 3) if lookups else None}
+
+    histogram = {}
+    for bound in SIZE_BUCKETS_KB:
+        histogram[f"<={bound}KB"] = 0
+    histogram[f">{SIZE_BUCKETS_KB[-1]}KB"] = 0
+    for size in sizes:
+        for bound in SIZE_BUCKETS_KB:
+            if size <= bound * 1024:
+                histogram[f"<={bound}KB"] += 1
+                break
+        else:
+            histogram[f">{SIZE_BUCKETS_KB[-1]}KB"] += 1
+
+    recorded_hits = [record["cache_hit"] for record in requests if "cache_hit" in record]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "empty_results": sum(1 for sample in ok if sample["result_count"] == 0),
+        "recorded_errors": sum(1 for record in requests if record.get("error")),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "latency_ms": {name: _round(percentile(latencies, fraction))
+                       for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))},
+        "service_ms": {name: _round(percentile(service_times, fraction))
+                       for name, fraction in (("p50", 0.5), ("p99", 0.99))},
+        "max_schedule_lag_ms": _round(max((sample["lag_ms"] for sample in samples), default=None)),
+        "cache": dict(cache, recorded_result_hit_rate=(
+            round(sum(recorded_hits) / len(recorded_hits), 3) if recorded_hits else None)),
+        "output_bytes": {name: _round(percentile(sizes, fraction))
+                         for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))},
+        "output_size_histogram": histogram,
+        "sample_errors": sorted({sample["error"] for sample in samples if sample["error"]})[:5],
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+def print_report(report: dict) -> None:
+    """Print the replay report."""
+    latency = report["latency_ms"]
+    sizes = report["output_bytes"]
+    cache = report["cache"]
+    service = report["service_ms"]
+    print(f"Requests: {report['requests']} ({report['errors']} errors, {report['empty_results']} empty results) "
+          f"in {report['elapsed_s']}s -> {report['throughput_rps']} req/s")
+    print(f"Recorded backend errors: {report['recorded_errors']}")
+    print(f"Latency ms (from schedule): p50={latency['p50']} p90={latency['p90']} p99={latency['p99']} "
+          f"max={latency['max']} (service p50={service['p50']} p99={service['p99']}, "
+          f"max schedule lag {report['max_schedule_lag_ms']}ms)")
+    for name in CACHES:
+        print(f"{name.capitalize()} cache: {cache[name]['hits']}/{cache[name]['lookups']} lookups hit "
+              f"(rate {cache[name]['hit_rate']})")
+    print(f"Recorded result cache hit rate: {cache['recorded_result_hit_rate']}")
+    print(f"Output bytes: p50={sizes['p50']} p90={sizes['p90']} p99={sizes['p99']} max={sizes['max']}")
+    print("Output size histogram: " + ", ".join(
+        f"{bucket}: {count}" for bucket, count in report["output_size_histogram"].items() if count))
+    for error in report["sample_errors"]:
+        print(f"Error: {error}")
+
+
+def generate(path: str, count: int, qps: float, repeat: float, seed: int = 1) -> None:
+    """Write a synthetic workload with Poisson arrivals and repeated queries."""
+    from fake_backends import WORDS
+
+    rng = random.Random(seed)
+    ts = time.time()
+    queries = []
+    with open(path, "w", encoding="utf-8") as file:
+        for _ in range(count):
+            ts += rng.expovariate(qps)
+            if queries and rng.random() < repeat:
+                query = rng.choice(queries)
+            else:
+                query = " ".join(rng.sample(WORDS, rng.randint(2, 5)))
+                queries.append(query)
+            file.write(json.dumps({"ts": round(ts, 3), "query": query, "limit": rng.choice((3, 3, 3, 5)),
+                                   "include_fields": None}) + "\n")
+    print(f"Wrote {count} requests to {path}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded search tool invocations.")
+    parser.add_argument("file", help="JSONL file of recorded invocations")
+    parser.add_argument("--rate", choices=("original", "scaled", "max"), default="original")
+    parser.add_argument("--speed", type=float, default=1.0, help="speed-up factor for --rate scaled")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight for --rate max")
+    parser.add_argument("--backend", choices=("fake", "live"), default="fake")
+    parser.add_argument("--workers", type=int, default=1, help="replay against a WorkerPool of N processes")
+    parser.add_argument("--max-requests", type=int, default=None)
+    parser.add_argument("--report", help="also write the report as JSON to this file")
+    parser.add_argument("--generate", type=int, metavar="N", help="write N synthetic requests to FILE and exit")
+    parser.add_argument("--qps", type=float, default=10.0, help="arrival rate for --generate")
+    parser.add_argument("--repeat", type=float, default=0.2, help="fraction of repeated queries for --generate")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.file, args.generate, args.qps, args.repeat)
+        return
+
+    requests, skipped = load_requests(args.file)
+    if skipped:
+        print(f"Skipped {skipped} lines without a recorded query")
+    requests = requests[:args.max_requests]
+    if not requests:
+        print(f"No requests to replay in {args.file}")
+        sys.exit(1)
+
+    searcher = build_searcher(args.backend, args.workers)
+    try:
+        await searcher.warm_up()
+        cache_before = await get_cache_stats(searcher)
+        start = time.perf_counter()
+        samples = await replay(requests, searcher, args.rate, args.speed, args.concurrency)
+        elapsed = time.perf_counter() - start
+        cache_after = await get_cache_stats(searcher)
+    finally:
+        await searcher.close()
+
+    report = summarize(samples, elapsed, cache_before, cache_after, requests)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
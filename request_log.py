@@ -0,0 +1,119 @@
+"""
+JSONL request log of search tool invocations.
+
+`RequestRecorder` appends one JSON object per `async_hybrid_search_mongodb_atlas` call:
+
+    {"ts": 1760790000.123, "query": "...", "limit": 3, "include_fields": null,
+     "duration_ms": 84.2, "output_bytes": 1890, "result_count": 3, "cache_hit": false, "error": null}
+
+`error` holds the backend error the search tool reported (it returns no results then).
+
+`load_requests` reads such a file back for `replay.py`. Only `ts` and `query` are required,
+so hand-written workloads can use the same format.
+"""
+
+import json
+import os
+import threading
+from typing import List, Optional, Tuple
+
+
+def output_size(results) -> int:
+    """Size in bytes of the tool output as it is serialized."""
+    if isinstance(results, str):
+        return len(results.encode("utf-8"))
+    return len(json.dumps(results, default=str).encode("utf-8"))
+
+
+def result_count(results) -> Optional[int]:
+    """Number of documents in the tool output, list or columnar JSON string."""
+    if isinstance(results, list):
+        return len(results)
+    if isinstance(results, str):
+        try:
+            rows = json.loads(results).get("rows")
+        except (ValueError, AttributeError):
+            return None
+        return len(rows) if isinstance(rows, list) else None
+    return None
+
+
+class RequestRecorder:
+    """
+    Append search tool invocations to a JSONL file.
+
+    Each record is written with a single append, so several processes (for example the
+    workers of a `WorkerPool`) can record to the same file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["RequestRecorder"]:
+        """A recorder writing to SEARCH_RECORD_FILE, or None when it is not set."""
+        path = os.getenv("SEARCH_RECORD_FILE")
+        return cls(path) if path else None
+
+    def record(self,
+            query: str,
+            limit: int,
+            include_fields: Optional[List[str]],
+            timestamp: float,
+            duration_ms: float,
+            results=None,
+            cache_hit: bool = False,
+            error: Optional[str] = None
+        ) -> None:
+        """Append one invocation."""
+        line = json.dumps({
+            "ts": round(timestamp, 3),
+            "query": query,
+            "limit": limit,
+            "include_fields": include_fields,
+            "duration_ms": round(duration_ms, 2),
+            "output_bytes": output_size(results),
+            "result_count": result_count(results),
+            "cache_hit": cache_hit,
+            "error": error,
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        """Close the log file."""
+        self._file.close()
+
+
+def load_requests(path: str) -> Tuple[List[dict], int]:
+    """
+    Read recorded invocations, sorted by timestamp.
+
+    Lines that are not JSON objects with a `query` are skipped.
+
+    Returns:
+        tuple: (requests, number of skipped lines)
+    """
+    requests, skipped = [], 0
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get("query"), str):
+                skipped += 1
+                continue
+            record.setdefault("ts", 0.0)
+            record.setdefault("limit", 3)
+            record.setdefault("include_fields", None)
+            requests.append(record)
+    requests.sort(key=lambda record: record["ts"])
+    return requests, skipped
@@ -0,0 +1,259 @@
+"""
+Lightweight local reranking for hybrid search results.
+
+Candidates over-fetched from `$rankFusion` are scored with cheap features (their fusion rank,
+cosine to the query embedding, BM25 of the truncated content and field boosts) and the best
+ones are packed into the tool output size budget. No cross-encoder or model call is involved,
+and the CPU cost is bounded by `max_candidates` and `max_chars`. Cosine similarities are
+computed with numpy, which is imported on the first rerank.
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens of a text."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class LightweightReranker:
+    """
+    Rerank search candidates with vectorized cheap features and pack them into a size budget.
+    """
+
+    def __init__(self,
+            fusion_weight: float = 0.7,
+            cosine_weight: float = 0.18,
+            bm25_weight: float = 0.09,
+            boost_weight: float = 0.03,
+            field_boosts: Optional[Dict[str, float]] = None,
+            max_candidates: int = 25,
+            max_chars: int = 2000,
+            k1: float = 1.2,
+            b: float = 0.75,
+            max_workers: int = 2
+        ):
+        self.fusion_weight = fusion_weight
+        self.cosine_weight = cosine_weight
+        self.bm25_weight = bm25_weight
+        self.boost_weight = boost_weight
+        self.field_boosts = field_boosts or {}
+        self.max_candidates = max_candidates
+        self.max_chars = max_chars
+        self.k1 = k1
+        self.b = b
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rerank")
+
+    @classmethod
+    def from_env(cls) -> "LightweightReranker":
+        """
+        Create a reranker configured from MONGODB_ATLAS_RERANK_* environment variables.
+
+        MONGODB_ATLAS_RERANK_FIELD_BOOSTS takes a comma separated list of field:boost pairs,
+        for example "title:2.0,category:1.0".
+        """
+        field_boosts = {}
+        for pair in os.getenv("MONGODB_ATLAS_RERANK_FIELD_BOOSTS", "").split(","):
+            if ":" in pair:
+                field, boost = pair.split(":", 1)
+                field_boosts[field.strip()] = float(boost)
+        return cls(
+            fusion_weight=float(os.getenv("MONGODB_ATLAS_RERANK_FUSION_WEIGHT", "0.7")),
+            cosine_weight=float(os.getenv("MONGODB_ATLAS_RERANK_COSINE_WEIGHT", "0.18")),
+            bm25_weight=float(os.getenv("MONGODB_ATLAS_RERANK_BM25_WEIGHT", "0.09")),
+            boost_weight=float(os.getenv("MONGODB_ATLAS_RERANK_BOOST_WEIGHT", "0.03")),
+            field_boosts=field_boosts,
+            max_candidates=int(os.getenv("MONGODB_ATLAS_RERANK_MAX_CANDIDATES", "25")),
+            max_chars=int(os.getenv("MONGODB_ATLAS_RERANK_MAX_CHARS", "2000")),
+        )
+
+    def close(self) -> None:
+        """Shut down the rerank thread pool."""
+        self._executor.shutdown(wait=False)
+
+    # ------------------------------------------------------------------
+    # Features
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def fusion_scores(count: int) -> List[float]:
+        """Prior from the fusion order of the candidates: 1.0 for the first, decreasing linearly."""
+        return [1.0 - position / count for position in range(count)]
+
+    @staticmethod
+    def cosine_scores(query_vector: List[float], vectors: List[Optional[List[float]]]) -> List[float]:
+        """Cosine similarity of each vector to the query vector (0.0 for missing vectors)."""
+        import numpy as np
+
+        scores = [0.0] * len(vectors)
+        rows = [i for i, vector in enumerate(vectors) if vector and len(vector) == len(query_vector)]
+        if not rows or not query_vector:
+            return scores
+        matrix = np.asarray([vectors[i] for i in rows], dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        norms[norms == 0] = 1.0
+        for i, score in zip(rows, (matrix @ query / norms).tolist()):
+            scores[i] = score
+        return scores
+
+    def bm25_scores(self, query_terms: List[str], documents: List[List[str]]) -> List[float]:
+        """BM25 of each tokenized document, using the candidate set as the corpus."""
+        n = len(documents)
+        if n == 0 or not query_terms:
+            return [0.0] * n
+        avg_len = (sum(len(doc) for doc in documents) / n) or 1.0
+        unique_terms = set(query_terms)
+        # Counter counts in C, much faster than a Python loop over the tokens
+        counts = [Counter(doc) for doc in documents]
+        doc_freq = {term: sum(1 for count in counts if term in count) for term in unique_terms}
+        idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+        scores = []
+        for doc, count in zip(documents, counts):
+            norm = self.k1 * (1 - self.b + self.b * len(doc) / avg_len)
+            scores.append(sum(idf[t] * count[t] * (self.k1 + 1) / (count[t] + norm)
+                              for t in unique_terms if t in count))
+        return scores
+
+    def boost_scores(self, query_terms: List[str], docs: List[dict]) -> List[float]:
+        """Weighted fraction of query terms present in each boosted field."""
+        if not self.field_boosts or not query_terms:
+            return [0.0] * len(docs)
+        unique_terms = set(query_terms)
+        total_boost = sum(self.field_boosts.values()) or 1.0
+        scores = []
+        for doc in docs:
+            score = 0.0
+            for field, boost in self.field_boosts.items():
+                value = doc.get(field)
+                if value is None:
+                    continue
+                field_terms = set(tokenize(str(value)[:self.max_chars]))
+                score += boost * len(unique_terms & field_terms) / len(unique_terms)
+            scores.append(score / total_boost)
+        return scores
+
+    # ------------------------------------------------------------------
+    # Rerank and pack
+    # ------------------------------------------------------------------
+
+    def rerank(self,
+            query: str,
+            query_vector: Optional[List[float]],
+            docs: List[dict],
+            content_field: str = "content",
+            embedding_field: str = "embedding"
+        ) -> List[dict]:
+        """
+        Score the candidates and return them best first.
+
+        Args:
+            query (str): The search text.
+            query_vector (list): The query embedding.
+            docs (list): Candidate documents, in fusion order. The order is used as a prior.
+            content_field (str): Field holding the text scored with BM25.
+            embedding_field (str): Field holding the document embedding. It is removed from the output.
+
+        Returns:
+            list: Documents sorted by descending `_rerank_score`, without the embedding field.
+        """
+        docs = docs[:self.max_candidates]
+        if not docs:
+            return []
+
+        query_terms = tokenize(query)
+        tokenized = [tokenize(str(doc.get(content_field, ""))[:self.max_chars]) for doc in docs]
+        fusion = self.fusion_scores(len(docs))
+        cosine = self.cosine_scores(query_vector or [], [doc.get(embedding_field) for doc in docs])
+        bm25 = _min_max(self.bm25_scores(query_terms, tokenized))
+        boosts = self.boost_scores(query_terms, docs)
+
+        scored = []
+        for position, doc in enumerate(docs):
+            score = (self.fusion_weight * fusion[position]
+                     + self.cosine_weight * cosine[position]
+                     + self.bm25_weight * bm25[position]
+                     + self.boost_weight * boosts[position])
+            reranked = {key: value for key, value in doc.items() if key != embedding_field}
+            reranked["_rerank_score"] = round(score, 4)
+            # Ties keep the fusion order.
+            scored.append((-score, position, reranked))
+        scored.sort(key=lambda item: (item[0], item[1]))
+        return [doc for _, _, doc in scored]
+
+    async def arerank(self,
+            query: str,
+            query_vector: Optional[List[float]],
+            docs: List[dict],
+            content_field: str = "content",
+            embedding_field: str = "embedding"
+        ) -> List[dict]:
+        """Run `rerank` in the thread pool so the event loop isn't blocked."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.rerank, query, query_vector, docs, content_field, embedding_field)
+
+    @staticmethod
+    def pack(docs: List[dict], max_bytes: int, limit: int, content_field: str = "content",
+             min_chars: int = 200) -> List[dict]:
+        """
+        Keep the best documents that fit in `max_bytes` of JSON output.
+
+        A document that does not fit whole has its content shortened to the remaining
+        budget (but not below `min_chars`) instead of being dropped.
+
+        Args:
+            docs (list): Documents, best first.
+            max_bytes (int): Size budget of the serialized list.
+            limit (int): Maximum number of documents to keep.
+            content_field (str): Field that may be shortened.
+            min_chars (int): Minimum content length worth keeping.
+
+        Returns:
+            list: The packed documents.
+        """
+        packed = []
+        used = 2  # "[]"
+        for doc in docs:
+            if len(packed) >= limit:
+                break
+            size = len(json.dumps(doc, default=str).encode("utf-8")) + 2  # ", " separator
+            if used + size <= max_bytes:
+                packed.append(doc)
+                used += size
+                continue
+
+            content = doc.get(content_field)
+            if not isinstance(content, str):
+                continue
+            overflow = used + size - max_bytes
+            keep = len(content) - overflow - 3
+            if keep < min_chars:
+                continue
+            shortened = dict(doc)
+            shortened[content_field] = content[:keep] + "..."
+            size = len(json.dumps(shortened, default=str).encode("utf-8")) + 2
+            if used + size <= max_bytes:
+                packed.append(shortened)
+                used += size
+        return packed
+
+
+def _min_max(values: List[float]) -> List[float]:
+    """Scale values to [0, 1]; constant inputs map to 0."""
+    if not values:
+        return []
+    low, high = min(values), max(values)
+    if high == low:
+        return [0.0] * len(values)
+    return [(value - low) / (high - low) for value in values]
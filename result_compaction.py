@@ -0,0 +1,272 @@
+"""
+Field-level compaction of search results before they are returned as tool output.
+
+`ResultCompactor` drops passages that near-duplicate a passage of a better ranked hit
+(shingled MinHash, with LSH banding so only colliding passages are compared), keeps the windows of content around query-term matches instead of the
+prefix, and can emit a columnar shape where field names are listed once. The tool output
+then carries more distinct information per KB and the model reads fewer prompt tokens.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from reranker import tokenize
+
+_PASSAGE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+# Mersenne prime used by the MinHash permutations, larger than the 32-bit shingle hashes.
+_PRIME = (1 << 61) - 1
+# Seed of the permutation parameters, so signatures are stable across processes.
+_PERM_SEED = 0x5EED
+# Words too common to anchor a passage window.
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was with what which who".split()
+)
+
+
+class ResultCompactor:
+    """
+    Deduplicate and summarize the content of search results.
+
+    Args:
+        content_field: Field holding the document text.
+        max_chars: Maximum number of content characters kept per document.
+        window_chars: Width of the window kept around a query-term match.
+        max_windows: Maximum number of windows kept per document.
+        shingle_size: Number of words per MinHash shingle.
+        num_perm: Number of MinHash permutations.
+        dedupe_threshold: Estimated Jaccard similarity at or above which a passage is a duplicate.
+        min_dedupe_tokens: Passages with fewer tokens are always kept. Short facts ("Weight 2 kg.")
+            make a single shingle and would match any other passage stating the same fact.
+            Defaults to 3 shingles.
+        bands: Number of LSH bands the signature is split into. Only passages sharing a band
+            with a kept passage are compared; `num_perm` must be a multiple of `bands`.
+        overfetch: Candidate over-fetch factor, so duplicates dropped here can be replaced.
+        max_workers: Threads of the executor `acompact` runs in.
+    """
+
+    def __init__(self,
+            content_field: str = "content",
+            max_chars: int = 500,
+            window_chars: int = 160,
+            max_windows: int = 3,
+            shingle_size: int = 3,
+            num_perm: int = 64,
+            dedupe_threshold: float = 0.8,
+            min_dedupe_tokens: Optional[int] = None,
+            bands: int = 16,
+            overfetch: int = 2,
+            max_workers: int = 1
+        ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.content_field = content_field
+        self.max_chars = max_chars
+        self.window_chars = window_chars
+        self.max_windows = max_windows
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.dedupe_threshold = dedupe_threshold
+        self.min_dedupe_tokens = min_dedupe_tokens if min_dedupe_tokens is not None else shingle_size * 3
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.overfetch = overfetch
+        # Universal hashes (a * h + b) mod p with a, b drawn from [1, p): the products wrap
+        # around p, so each permutation orders the shingles differently
+        rng = random.Random(_PERM_SEED)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(1, _PRIME)) for _ in range(num_perm)]
+        self.stats = {"passages_dropped": 0, "documents_dropped": 0, "bytes_in": 0, "bytes_out": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="compact")
+
+    @classmethod
+    def from_env(cls, content_field: str = "content") -> "ResultCompactor":
+        """Create a compactor configured from MONGODB_ATLAS_COMPACT_* environment variables."""
+        return cls(
+            content_field=content_field,
+            max_chars=int(os.getenv("MONGODB_ATLAS_COMPACT_MAX_CHARS", "500")),
+            window_chars=int(os.getenv("MONGODB_ATLAS_COMPACT_WINDOW_CHARS", "160")),
+            max_windows=int(os.getenv("MONGODB_ATLAS_COMPACT_MAX_WINDOWS", "3")),
+            dedupe_threshold=float(os.getenv("MONGODB_ATLAS_COMPACT_DEDUPE_THRESHOLD", "0.8")),
+            min_dedupe_tokens=int(os.getenv("MONGODB_ATLAS_COMPACT_MIN_DEDUPE_TOKENS", "9")),
+            overfetch=int(os.getenv("MONGODB_ATLAS_COMPACT_OVERFETCH", "2")),
+        )
+
+    def close(self) -> None:
+        """Shut down the compaction thread pool."""
+        self._executor.shutdown(wait=False)
+
+    # ------------------------------------------------------------------
+    # MinHash deduplication
+    # ------------------------------------------------------------------
+
+    def signature(self, text: str) -> List[int]:
+        """MinHash signature of the word shingles of a text."""
+        tokens = tokenize(text)
+        k = self.shingle_size
+        if len(tokens) <= k:
+            shingles = {" ".join(tokens)}
+        else:
+            shingles = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    @staticmethod
+    def similarity(first: List[int], second: List[int]) -> float:
+        """Estimated Jaccard similarity of two MinHash signatures."""
+        if not first or not second:
+            return 0.0
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+    def band_keys(self, signature: List[int]) -> List[tuple]:
+        """LSH bucket keys of a signature, one per band of `rows` hash values."""
+        rows = self.rows
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def split_passages(self, text: str) -> List[str]:
+        """Split a text into sentence-like passages."""
+        return [passage.strip() for passage in _PASSAGE_RE.split(text) if passage.strip()]
+
+    def dedupe(self, docs: List[dict]) -> List[dict]:
+        """
+        Drop passages that near-duplicate a passage already kept from a better ranked document.
+
+        Documents whose passages are all duplicates are dropped. Documents are expected best first.
+        Passages shorter than `min_dedupe_tokens` are kept as they are. A passage is compared only
+        with the kept passages sharing one of its LSH bands, instead of with every kept passage.
+        """
+        kept_signatures: List[List[int]] = []
+        buckets: Dict[tuple, List[int]] = defaultdict(list)
+        deduped = []
+        for doc in docs:
+            content = doc.get(self.content_field)
+            if not isinstance(content, str) or not content:
+                deduped.append(doc)
+                continue
+
+            passages = []
+            for passage in self.split_passages(content):
+                if len(tokenize(passage)) < self.min_dedupe_tokens:
+                    passages.append(passage)
+                    continue
+                signature = self.signature(passage)
+                keys = self.band_keys(signature)
+                candidates = {index for key in keys for index in buckets.get(key, ())}
+                if any(self.similarity(signature, kept_signatures[index]) >= self.dedupe_threshold
+                       for index in candidates):
+                    self.stats["passages_dropped"] += 1
+                    continue
+                for key in keys:
+                    buckets[key].append(len(kept_signatures))
+                kept_signatures.append(signature)
+                passages.append(passage)
+
+            if not passages:
+                self.stats["documents_dropped"] += 1
+                continue
+            compacted = dict(doc)
+            compacted[self.content_field] = " ".join(passages)
+            deduped.append(compacted)
+        return deduped
+
+    # ------------------------------------------------------------------
+    # Query-term windows
+    # ------------------------------------------------------------------
+
+    def windows(self, text: str, query_terms: List[str]) -> str:
+        """
+        Keep the windows of text around query-term matches, up to `max_chars`.
+
+        Falls back to the prefix when no query term occurs in the text.
+        """
+        if len(text) <= self.max_chars:
+            return text
+
+        terms = {term for term in query_terms if term not in STOPWORDS}
+        spans = []
+        if terms:
+            pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in sorted(terms)) + r")\b", re.IGNORECASE)
+            half = self.window_chars // 2
+            for match in pattern.finditer(text):
+                start = max(0, match.start() - half)
+                end = min(len(text), match.end() + half)
+                if spans and start <= spans[-1][1]:
+                    spans[-1][1] = max(spans[-1][1], end)
+                else:
+                    spans.append([start, end])
+
+        if not spans:
+            return text[:self.max_chars] + "..."
+
+        parts = []
+        budget = self.max_chars
+        for start, end in spans[:self.max_windows]:
+            if budget <= 0:
+                break
+            end = min(end, start + budget)
+            # Snap to word boundaries
+            while start > 0 and not text[start - 1].isspace():
+                start -= 1
+            while end < len(text) and not text[end].isspace() and end - start < budget + 20:
+                end += 1
+            snippet = text[start:end].strip()
+            parts.append(("..." if start > 0 else "") + snippet + ("..." if end < len(text) else ""))
+            budget -= len(snippet)
+        return " ".join(parts)
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact(self, docs: List[dict], query: str) -> List[dict]:
+        """
+        Deduplicate passages across documents and keep the query-relevant windows of content.
+
+        Args:
+            docs (list): Documents, best first, with full (untruncated) content.
+            query (str): The search text.
+
+        Returns:
+            list: The compacted documents.
+        """
+        self.stats["bytes_in"] += len(json.dumps(docs, default=str).encode("utf-8"))
+        query_terms = tokenize(query)
+        compacted = []
+        for doc in self.dedupe(docs):
+            content = doc.get(self.content_field)
+            if isinstance(content, str):
+                doc = dict(doc)
+                doc[self.content_field] = self.windows(content, query_terms)
+            compacted.append(doc)
+        self.stats["bytes_out"] += len(json.dumps(compacted, default=str).encode("utf-8"))
+        return compacted
+
+    async def acompact(self, docs: List[dict], query: str) -> List[dict]:
+        """Run `compact` in the thread pool so the event loop isn't blocked."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.compact, docs, query)
+
+    @staticmethod
+    def to_columnar(docs: List[dict], fields: Optional[List[str]] = None) -> Dict[str, list]:
+        """
+        Convert documents to a columnar shape with field names listed once.
+
+        Args:
+            docs (list): Documents to convert.
+            fields (list): Field order. Defaults to the fields in order of first appearance.
+
+        Returns:
+            dict: {"fields": [...], "rows": [[...], ...]}. Missing fields are null.
+        """
+        if fields is None:
+            fields = []
+            for doc in docs:
+                for key in doc:
+                    if key not in fields:
+                        fields.append(key)
+        return {"fields": fields, "rows": [[doc.get(field) for field in fields] for doc in docs]}
@@ -0,0 +1,200 @@
+"""
+Caches for query embeddings and search results.
+
+`LocalCache` is an in-process LRU cache with a TTL. `SharedCacheServer` serves one
+`LocalCache` to several processes over a local socket (a `multiprocessing` manager), and
+`SharedCacheClient` is the per-process handle to it, so worker processes share cache hits
+instead of each warming its own cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+from typing import Any, Optional, Tuple
+
+
+def cache_key(prefix: str, *parts: Any) -> str:
+    """Build a compact cache key from JSON-serializable parts."""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def _count_lookup(stats: dict, key: str, hit: bool) -> None:
+    """Count a hit or miss, overall and for the key prefix (e.g. "embedding" or "search")."""
+    outcome = "hits" if hit else "misses"
+    stats[outcome] += 1
+    by_prefix = stats["by_prefix"].setdefault(key.split(":", 1)[0], {"hits": 0, "misses": 0})
+    by_prefix[outcome] += 1
+
+
+def _copy_stats(stats: dict) -> dict:
+    copied = dict(stats)
+    copied["by_prefix"] = {prefix: dict(counts) for prefix, counts in stats["by_prefix"].items()}
+    return copied
+
+
+class LocalCache:
+    """
+    Thread-safe LRU cache with a per-entry time to live.
+
+    Args:
+        max_entries: Maximum number of entries kept. 0 disables the cache.
+        ttl_seconds: Default time to live of an entry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "by_prefix": {}}
+
+    @classmethod
+    def from_env(cls) -> "LocalCache":
+        """Create a cache configured from SEARCH_CACHE_* environment variables."""
+        return cls(
+            max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300")),
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                _count_lookup(self._stats, key, hit=False)
+                return None
+            self._entries.move_to_end(key)
+            _count_lookup(self._stats, key, hit=True)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries past `max_entries`."""
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            self._stats["sets"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Hit, miss, set and eviction counters (hits and misses also per key prefix) and the current size."""
+        with self._lock:
+            return dict(_copy_stats(self._stats), size=len(self._entries))
+
+
+# The cache held by the SharedCacheServer process
+_server_cache: Optional[LocalCache] = None
+
+
+def _init_server_cache(max_entries: int, ttl_seconds: float) -> None:
+    """Create the shared cache in the server process."""
+    global _server_cache
+    _server_cache = LocalCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+
+def _get_server_cache() -> LocalCache:
+    """Return the shared cache of the server process."""
+    return _server_cache
+
+
+class _ServerManager(BaseManager):
+    """Manager started by `SharedCacheServer`."""
+
+
+_ServerManager.register("get_cache", callable=_get_server_cache)
+
+
+class _ClientManager(BaseManager):
+    """Manager used by `SharedCacheClient` to connect to the server."""
+
+
+_ClientManager.register("get_cache")
+
+
+class SharedCacheServer:
+    """
+    Serve a `LocalCache` to other processes over a local socket.
+
+    Args:
+        address: (host, port) to listen on. Port 0 picks a free port.
+        authkey: Shared secret clients must present.
+        max_entries: Maximum number of cached entries.
+        ttl_seconds: Default time to live of an entry.
+    """
+
+    def __init__(self,
+            address: Tuple[str, int] = ("127.0.0.1", 0),
+            authkey: Optional[bytes] = None,
+            max_entries: int = 4096,
+            ttl_seconds: float = 300.0
+        ) -> None:
+        self.authkey = authkey or os.urandom(16)
+        self._manager = _ServerManager(address=address, authkey=self.authkey)
+        self._manager.start(initializer=_init_server_cache, initargs=(max_entries, ttl_seconds))
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The address clients connect to."""
+        return self._manager.address
+
+    def shutdown(self) -> None:
+        """Stop the cache server process."""
+        self._manager.shutdown()
+
+
+class SharedCacheClient:
+    """
+    Per-process handle to a `SharedCacheServer`.
+
+    Errors talking to the server are treated as misses, so a failed cache tier only
+    costs cache hits. Hits and misses seen by this process are counted locally.
+    """
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes) -> None:
+        manager = _ClientManager(address=tuple(address), authkey=authkey)
+        manager.connect()
+        self._cache = manager.get_cache()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0, "by_prefix": {}}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss."""
+        try:
+            # Proxies are not thread-safe
+            with self._lock:
+                value = self._cache.get(key)
+        except Exception:
+            self._stats["errors"] += 1
+            value = None
+        _count_lookup(self._stats, key, hit=value is not None)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value in the shared cache."""
+        try:
+            with self._lock:
+                self._cache.set(key, value, ttl_seconds)
+            self._stats["sets"] += 1
+        except Exception:
+            self._stats["errors"] += 1
+
+    def stats(self) -> dict:
+        """Counters of this process (hits and misses also per key prefix), plus the shared cache size."""
+        stats = _copy_stats(self._stats)
+        try:
+            with self._lock:
+                stats["size"] = self._cache.stats()["size"]
+        except Exception:
+            stats["size"] = None
+        return stats
@@ -0,0 +1,362 @@
+"""
+numCandidates tuning for MongoDB Atlas Vector Search.
+
+Offline, `NumCandidatesTuner.sweep` runs `$vectorSearch` at several numCandidates/limit
+ratios against an exact-kNN (`"exact": true`) baseline on a sample of queries and fits a
+recall and latency curve. Online, `NumCandidatesTuner.choose` picks the smallest
+numCandidates that meets the configured recall target within the latency SLO.
+
+The offline curve only times the `$vectorSearch` stage, so it is compared against
+`latency_slo_ms`. Latencies observed online are end-to-end pipeline latencies (including
+the full-text search and `$rankFusion`) and are compared against `pipeline_latency_slo_ms`,
+only once `min_samples` of them are available. A numCandidates excluded by online latency
+is re-probed every `reprobe_every` choices, so a burst of slow queries can't exclude it for good.
+"""
+
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+# numCandidates / limit ratios swept offline. Atlas recommends 10-20x the limit.
+DEFAULT_RATIOS = (1, 2, 5, 10, 20, 40)
+# Atlas Vector Search rejects numCandidates above this value.
+MAX_NUM_CANDIDATES = 10000
+
+
+class NumCandidatesTuner:
+    """
+    Chooses `numCandidates` for `$vectorSearch` from a fitted recall/latency curve.
+
+    Without a curve the tuner returns `default_num_candidates`, which keeps the
+    previous fixed behaviour of the search tool.
+    """
+
+    def __init__(self,
+            recall_target: float = 0.95,
+            latency_slo_ms: float = 250.0,
+            default_num_candidates: int = 50,
+            ratios: Sequence[int] = DEFAULT_RATIOS,
+            curve_file: Optional[str] = None,
+            ewma_alpha: float = 0.2,
+            pipeline_latency_slo_ms: float = 1000.0,
+            min_samples: int = 5,
+            reprobe_every: int = 100
+        ):
+        self.recall_target = recall_target
+        self.latency_slo_ms = latency_slo_ms
+        self.default_num_candidates = default_num_candidates
+        self.ratios = sorted(set(int(r) for r in ratios if r >= 1))
+        self.curve_file = curve_file
+        self.ewma_alpha = ewma_alpha
+        self.pipeline_latency_slo_ms = pipeline_latency_slo_ms
+        self.min_samples = max(int(min_samples), 1)
+        self.reprobe_every = max(int(reprobe_every), 1)
+
+        # ratio -> {"recall": measured recall, "latency_ms": measured mean latency}
+        self.points: Dict[int, dict] = {}
+        # Fitted parameters: recall(r) = 1 - a * r^-b, latency(r) = c + d * r
+        self.recall_fit: Optional[tuple] = None
+        self.latency_fit: Optional[tuple] = None
+        # numCandidates -> {"latency_ms": EWMA of end-to-end latencies observed online,
+        #                   "samples": number of observations, "choice": choice count at the last one}
+        self._observed: Dict[int, dict] = {}
+        self._choices = 0
+        self.metrics: dict = {
+            "recall_target": recall_target,
+            "latency_slo_ms": latency_slo_ms,
+            "num_candidates": default_num_candidates,
+            "limit": None,
+            "predicted_recall": None,
+            "measured_recall": None,
+            "latency_ms_ewma": None,
+            "pipeline_latency_slo_ms": pipeline_latency_slo_ms,
+            "reprobes": 0,
+            "curve_loaded": False,
+        }
+
+        if curve_file and os.path.exists(curve_file):
+            self.load(curve_file)
+
+    @classmethod
+    def from_env(cls) -> "NumCandidatesTuner":
+        """Create a tuner configured from MONGODB_ATLAS_* environment variables."""
+        return cls(
+            recall_target=float(os.getenv("MONGODB_ATLAS_RECALL_TARGET", "0.95")),
+            latency_slo_ms=float(os.getenv("MONGODB_ATLAS_LATENCY_SLO_MS", "250")),
+            default_num_candidates=int(os.getenv("MONGODB_ATLAS_NUM_CANDIDATES", "50")),
+            curve_file=os.getenv("MONGODB_ATLAS_TUNING_FILE", "numcandidates_curve.json"),
+            pipeline_latency_slo_ms=float(os.getenv("MONGODB_ATLAS_PIPELINE_LATENCY_SLO_MS", "1000")),
+        )
+
+    # ------------------------------------------------------------------
+    # Curve fitting
+    # ------------------------------------------------------------------
+
+    def fit(self) -> None:
+        """Fit the recall and latency curves to the measured points."""
+        if not self.points:
+            self.recall_fit = None
+            self.latency_fit = None
+            return
+
+        # Recall: log(1 - recall) = log(a) - b * log(r), least squares in log space.
+        xs, ys = [], []
+        for ratio, point in self.points.items():
+            miss = max(1.0 - point["recall"], 1e-4)
+            xs.append(math.log(ratio))
+            ys.append(math.log(miss))
+        intercept, slope = _linear_fit(xs, ys)
+        self.recall_fit = (math.exp(intercept), max(-slope, 0.0))
+
+        # Latency grows roughly linearly with the number of candidates scanned.
+        ratios = list(self.points)
+        latencies = [self.points[r]["latency_ms"] for r in ratios]
+        self.latency_fit = _linear_fit([float(r) for r in ratios], latencies)
+
+    def predict_recall(self, ratio: float) -> Optional[float]:
+        """Predict recall at a numCandidates/limit ratio, preferring measured points."""
+        if int(ratio) in self.points and ratio == int(ratio):
+            return self.points[int(ratio)]["recall"]
+        if not self.recall_fit:
+            return None
+        a, b = self.recall_fit
+        return min(1.0, max(0.0, 1.0 - a * ratio ** -b))
+
+    def predict_latency_ms(self, num_candidates: int, limit: int) -> Optional[float]:
+        """Predict the `$vectorSearch` latency from the offline measurements."""
+        ratio = num_candidates / max(limit, 1)
+        if int(ratio) in self.points and ratio == int(ratio):
+            return self.points[int(ratio)]["latency_ms"]
+        if not self.latency_fit:
+            return None
+        c, d = self.latency_fit
+        return max(0.0, c + d * ratio)
+
+    def observed_latency_ms(self, num_candidates: int) -> Optional[float]:
+        """EWMA of the end-to-end latency observed online, once `min_samples` are available."""
+        observed = self._observed.get(num_candidates)
+        if observed is None or observed["samples"] < self.min_samples:
+            return None
+        return observed["latency_ms"]
+
+    def _within_online_slo(self, num_candidates: int) -> bool:
+        """Check the online latency, re-probing a numCandidates excluded for `reprobe_every` choices."""
+        latency = self.observed_latency_ms(num_candidates)
+        if latency is None or latency <= self.pipeline_latency_slo_ms:
+            return True
+        if self._choices - self._observed[num_candidates]["choice"] >= self.reprobe_every:
+            # Not measured since it was excluded: forget the old samples and measure it again
+            del self._observed[num_candidates]
+            self.metrics["reprobes"] += 1
+            return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Online selection
+    # ------------------------------------------------------------------
+
+    def choose(self, limit: int) -> int:
+        """
+        Pick numCandidates for a query returning `limit` results.
+
+        Args:
+            limit (int): Number of results the `$vectorSearch` stage returns.
+
+        Returns:
+            int: The smallest numCandidates meeting the recall target within the latency SLO.
+                 If no ratio meets both, the highest-recall ratio within the SLO is used.
+        """
+        limit = max(int(limit), 1)
+        self._choices += 1
+        chosen = None
+        chosen_recall = None
+
+        if self.recall_fit:
+            best_within_slo = None
+            for ratio in self.ratios:
+                num_candidates = min(ratio * limit, MAX_NUM_CANDIDATES)
+                recall = self.predict_recall(ratio)
+                latency = self.predict_latency_ms(num_candidates, limit)
+                within_slo = latency is None or latency <= self.latency_slo_ms
+                if not within_slo or not self._within_online_slo(num_candidates):
+                    continue
+                if recall is not None and recall >= self.recall_target:
+                    chosen, chosen_recall = num_candidates, recall
+                    break
+                if best_within_slo is None or (recall or 0.0) > best_within_slo[1]:
+                    best_within_slo = (num_candidates, recall)
+            if chosen is None and best_within_slo is not None:
+                chosen, chosen_recall = best_within_slo
+
+        if chosen is None:
+            chosen = min(max(self.default_num_candidates, limit), MAX_NUM_CANDIDATES)
+            chosen_recall = self.predict_recall(chosen / limit)
+
+        measured = self.points.get(chosen // limit) if chosen % limit == 0 else None
+        self.metrics.update({
+            "num_candidates": chosen,
+            "limit": limit,
+            "predicted_recall": chosen_recall,
+            "measured_recall": measured["recall"] if measured else None,
+            "latency_ms_ewma": self.observed_latency_ms(chosen),
+        })
+        return chosen
+
+    def observe(self, num_candidates: int, latency_ms: float) -> None:
+        """
+        Record the end-to-end latency of a live query so selection tracks current cluster load.
+
+        The first `min_samples` observations are averaged before the EWMA takes over, so a
+        single slow query (a cold connection pool, say) doesn't dominate the estimate.
+        """
+        observed = self._observed.setdefault(num_candidates, {"latency_ms": 0.0, "samples": 0, "choice": 0})
+        observed["samples"] += 1
+        observed["choice"] = self._choices
+        if observed["samples"] <= self.min_samples:
+            observed["latency_ms"] += (latency_ms - observed["latency_ms"]) / observed["samples"]
+        else:
+            observed["latency_ms"] = self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * observed["latency_ms"]
+        if self.metrics.get("num_candidates") == num_candidates:
+            self.metrics["latency_ms_ewma"] = self.observed_latency_ms(num_candidates)
+
+    # ------------------------------------------------------------------
+    # Offline sweep
+    # ------------------------------------------------------------------
+
+    def sweep(self,
+            collection,
+            index_name: str,
+            path: str,
+            query_vectors: List[List[float]],
+            limit: int = 5,
+            ratios: Optional[Sequence[int]] = None
+        ) -> Dict[int, dict]:
+        """
+        Measure recall and latency of approximate search against an exact-kNN baseline.
+
+        Args:
+            collection: The pymongo collection holding the vector index.
+            index_name (str): Name of the Atlas Vector Search index.
+            path (str): Path of the embedding field.
+            query_vectors (list): Sample of query embeddings.
+            limit (int): Number of results per query.
+            ratios (list): numCandidates/limit ratios to sweep (default: the tuner's ratios).
+
+        Returns:
+            dict: ratio -> {"recall", "latency_ms", "num_candidates"} for the swept ratios.
+        """
+        ratios = sorted(set(ratios or self.ratios))
+        baselines = []
+        for vector in query_vectors:
+            stage = {
+                "$vectorSearch": {
+                    "index": index_name,
+                    "path": path,
+                    "queryVector": vector,
+                    "exact": True,
+                    "limit": limit,
+                }
+            }
+            baselines.append({doc["_id"] for doc in collection.aggregate([stage, {"$project": {"_id": 1}}])})
+
+        for ratio in ratios:
+            num_candidates = min(ratio * limit, MAX_NUM_CANDIDATES)
+            recalls, latencies = [], []
+            for vector, expected in zip(query_vectors, baselines):
+                stage = {
+                    "$vectorSearch": {
+                        "index": index_name,
+                        "path": path,
+                        "queryVector": vector,
+                        "numCandidates": num_candidates,
+                        "limit": limit,
+                    }
+                }
+                start = time.perf_counter()
+                found = {doc["_id"] for doc in collection.aggregate([stage, {"$project": {"_id": 1}}])}
+                latencies.append((time.perf_counter() - start) * 1000)
+                if expected:
+                    recalls.append(len(found & expected) / len(expected))
+            self.points[ratio] = {
+                "recall": sum(recalls) / len(recalls) if recalls else 1.0,
+                "latency_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+                "num_candidates": num_candidates,
+            }
+            print(f"numCandidates={num_candidates:>5} (x{ratio}): "
+                  f"recall={self.points[ratio]['recall']:.3f} latency={self.points[ratio]['latency_ms']:.1f}ms")
+
+        self.fit()
+        self.metrics["curve_loaded"] = True
+        return {r: self.points[r] for r in ratios}
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the measured points to a JSON file."""
+        path = path or self.curve_file
+        if not path:
+            raise ValueError("No curve file configured.")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"points": {str(r): p for r, p in self.points.items()}}, file, indent=2)
+
+    def load(self, path: str) -> None:
+        """Load measured points from a JSON file and refit the curves."""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            self.points = {int(r): p for r, p in data.get("points", {}).items()}
+            self.fit()
+            self.metrics["curve_loaded"] = bool(self.points)
+        except (OSError, ValueError) as e:
+            print(f"Could not load numCandidates curve from {path}: {e}")
+
+
+def _linear_fit(xs: List[float], ys: List[float]) -> tuple:
+    """Ordinary least squares fit of y = intercept + slope * x."""
+    n = len(xs)
+    if n == 0:
+        return 0.0, 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return mean_y, 0.0
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    return mean_y - slope * mean_x, slope
+
+
+# Offline sweep:
+#   python search_tuning.py sample_queries.txt [limit]
+import asyncio
+import sys
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from mongodb_hybridsearch import MongoDBAtlasHybridSearch
+
+    load_dotenv()
+
+    async def main():
+        if len(sys.argv) < 2:
+            print("Usage: python search_tuning.py <queries file, one query per line> [limit]")
+            sys.exit(1)
+        limit = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+        with open(sys.argv[1], "r", encoding="utf-8") as file:
+            queries = [line.strip() for line in file if line.strip()]
+
+        searcher = MongoDBAtlasHybridSearch()
+        vectors = [await searcher.get_embedding(query) for query in queries]
+        tuner = searcher.tuner
+        tuner.sweep(searcher.collection, searcher.vector_index_name, searcher.vectorindex_path,
+                    vectors, limit=limit)
+        tuner.save()
+        print(f"Saved curve to {tuner.curve_file}")
+        print(f"Chosen numCandidates for limit={limit}: {tuner.choose(limit)}")
+        print(json.dumps(tuner.metrics, indent=2))
+        await searcher.close()
+
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Optional
 
 from azure.ai.projects.aio import AIProjectClient
 from azure.ai.agents.models import (
@@ -14,21 +14,26 @@ from azure.ai.agents.models import (
     ThreadRun,
 )
 
+from conversation_budget import TurnAccounting
 from utilities import Utilities
 
 
 class StreamEventHandler(AsyncAgentEventHandler[str]):
     """Handle LLM streaming events and tokens."""
 
-    def __init__(self, functions: AsyncFunctionTool, project_client: AIProjectClient, utilities: Utilities) -> None:
+    def __init__(self, functions: AsyncFunctionTool, project_client: AIProjectClient, utilities: Utilities,
+                 turn: Optional[TurnAccounting] = None) -> None:
         self.functions = functions
         self.project_client = project_client
         self.util = utilities
+        self.turn = turn
         super().__init__()
 
     async def on_message_delta(self, delta: MessageDeltaChunk) -> None:
         """Handle message delta events. This will be the streamed token"""
         self.util.log_token_blue(delta.text)
+        if self.turn:
+            self.turn.add_answer(delta.text)
 
     async def on_thread_message(self, message: ThreadMessage) -> None:
         """Handle thread message events."""
@@ -47,8 +52,16 @@ class StreamEventHandler(AsyncAgentEventHandler[str]):
             print(f"Thread ID: {run.thread_id}")
             print(f"Run ID: {run.id}")
 
+        if self.turn and run.status == RunStatus.COMPLETED and run.usage:
+            self.turn.set_usage(run.usage.prompt_tokens, run.usage.completion_tokens)
+
     async def on_run_step(self, step: RunStep) -> None:
-        pass
+        if self.turn and step.status == RunStepStatus.COMPLETED:
+            # Tool outputs stay in the thread and weigh on later turns
+            for tool_call in getattr(step.step_details, "tool_calls", None) or []:
+                function = getattr(tool_call, "function", None)
+                if function is not None and function.output:
+                    self.turn.add_tool_output(str(function.output))
         # if step.status == RunStepStatus.COMPLETED:
         #     print()
         # self.util.log_msg_purple(f"RunStep type: {step.type}, Status: {step.status}")
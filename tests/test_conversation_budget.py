@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from conversation_budget import ThreadBudgetManager
+
+
+class _Text:
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+class _TextPart:
+    def __init__(self, value: str) -> None:
+        self.text = _Text(value)
+
+
+class _Message:
+    def __init__(self, role: str, text: str) -> None:
+        self.role = role
+        self.text_messages = [_TextPart(text)]
+
+
+class _Thread:
+    def __init__(self, thread_id: str) -> None:
+        self.id = thread_id
+
+
+class StubThreads:
+    def __init__(self, client) -> None:
+        self.client = client
+        self.deleted = []
+
+    async def create(self):
+        thread_id = f"thread-{len(self.client.messages_by_thread) + 1}"
+        self.client.messages_by_thread[thread_id] = []
+        return _Thread(thread_id)
+
+    async def delete(self, thread_id: str) -> None:
+        self.deleted.append(thread_id)
+        self.client.messages_by_thread.pop(thread_id, None)
+
+
+class StubMessages:
+    def __init__(self, client) -> None:
+        self.client = client
+
+    async def create(self, thread_id: str, role: str, content: str):
+        message = _Message(role, content)
+        self.client.messages_by_thread[thread_id].append(message)
+        return message
+
+    async def list(self, thread_id: str, order: str = "asc"):
+        for message in self.client.messages_by_thread[thread_id]:
+            yield message
+
+
+class StubAgentsClient:
+    """The `threads` and `messages` operations used by ThreadBudgetManager."""
+
+    def __init__(self) -> None:
+        self.messages_by_thread = {"original": []}
+        self.threads = StubThreads(self)
+        self.messages = StubMessages(self)
+
+
+async def run_turns(manager: ThreadBudgetManager, client: StubAgentsClient, count: int, tool_output: str = ""):
+    """Post `count` turns on the "original" conversation, returning their TurnAccounting."""
+    turns = []
+    for index in range(count):
+        question = f"Question {index} about tents. Please be specific."
+        turn = await manager.prepare_turn("original", question)
+        await client.messages.create(thread_id=turn.thread_id, role="user", content=question)
+        answer = f"Answer {index}. The tent sleeps two."
+        await client.messages.create(thread_id=turn.thread_id, role="assistant", content=answer)
+        turn.add_answer(answer)
+        turn.add_tool_output(tool_output)
+        manager.complete_turn(turn)
+        turns.append(turn)
+    return turns
+
+
+def test_under_threshold_no_policy_applies():
+    client = StubAgentsClient()
+    manager = ThreadBudgetManager(client, token_threshold=10000)
+    turns = asyncio.run(run_turns(manager, client, 3))
+    assert all(turn.thread_id == "original" and turn.run_options == {} for turn in turns)
+    assert manager.created_thread_ids == []
+
+
+def test_truncate_sets_run_options_once_over_threshold():
+    models = pytest.importorskip("azure.ai.agents.models")
+    client = StubAgentsClient()
+    manager = ThreadBudgetManager(client, token_threshold=500, policy="truncate", keep_last_messages=4)
+    turns = asyncio.run(run_turns(manager, client, 3, tool_output="x" * 4000))
+
+    assert turns[0].run_options == {}
+    strategy = turns[1].run_options["truncation_strategy"]
+    assert isinstance(strategy, models.TruncationObject)
+    assert strategy.type == "last_messages"
+    assert strategy.last_messages == 4
+    assert all(turn.thread_id == "original" for turn in turns)
+
+
+def test_truncated_history_is_reported_as_sent_and_cumulative(capsys):
+    pytest.importorskip("azure.ai.agents.models")
+    client = StubAgentsClient()
+    manager = ThreadBudgetManager(client, token_threshold=500, keep_last_messages=2, report=True)
+    turns = asyncio.run(run_turns(manager, client, 4, tool_output="x" * 4000))
+
+    cumulative = manager.history_tokens("original")
+    sent = manager.sent_history_tokens("original", truncated=True)
+    assert sent == turns[-1].estimated_tokens
+    assert cumulative == sum(turn.estimated_tokens for turn in turns)
+    last_line = capsys.readouterr().out.strip().splitlines()[-1]
+    assert f"~{sent} sent (last 2 messages of ~{cumulative} cumulative)" in last_line
+
+
+def test_rollover_continues_on_a_new_thread_seeded_with_a_summary():
+    client = StubAgentsClient()
+    manager = ThreadBudgetManager(client, token_threshold=1500, policy="rollover", keep_last_messages=2)
+    turns = asyncio.run(run_turns(manager, client, 3, tool_output="x" * 4000))
+
+    assert [turn.thread_id for turn in turns] == ["original", "original", "thread-2"]
+    assert manager.current_thread_id("original") == "thread-2"
+    assert manager.created_thread_ids == ["thread-2"]
+    assert turns[2].run_options == {}
+
+    seed = client.messages_by_thread["thread-2"][0]
+    summary = seed.text_messages[0].text.value
+    assert seed.role == "user"
+    assert summary.startswith("Context from earlier in this conversation")
+    assert "Answer 1. The tent sleeps two." in summary
+    assert "x" * 100 not in summary
+    assert len(summary) <= manager.summary_max_chars + 3
+
+
+def test_created_threads_can_be_cleaned_up():
+    client = StubAgentsClient()
+    manager = ThreadBudgetManager(client, token_threshold=1500, policy="rollover")
+
+    async def run():
+        await run_turns(manager, client, 6, tool_output="x" * 4000)
+        # As main.cleanup does
+        for thread_id in manager.created_thread_ids:
+            await client.threads.delete(thread_id)
+
+    asyncio.run(run())
+    assert len(manager.created_thread_ids) == 2
+    assert client.threads.deleted == manager.created_thread_ids
+    assert set(client.messages_by_thread) == {"original"}
@@ -0,0 +1,153 @@
+import asyncio
+from collections import namedtuple
+
+import pytest
+
+from credential_provider import SharedTokenCredential
+
+AccessToken = namedtuple("AccessToken", "token expires_on")
+SCOPE = "https://cognitiveservices.azure.com/.default"
+
+
+class FakeTimer:
+    """Clock and sleep controlled by the test."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps = []
+        self._waiters = []
+
+    def clock(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((seconds, future))
+        await future
+
+    def advance(self) -> None:
+        """Wake the pending sleep, moving the clock forward by its duration."""
+        seconds, future = self._waiters.pop(0)
+        self.now += seconds
+        future.set_result(None)
+
+
+class FakeCredential:
+    def __init__(self, timer: FakeTimer, lifetime: float = 3600.0) -> None:
+        self.timer = timer
+        self.lifetime = lifetime
+        self.calls = []
+        self.fail = False
+
+    async def get_token(self, *scopes, claims=None, tenant_id=None):
+        self.calls.append({"scopes": scopes, "claims": claims, "tenant_id": tenant_id})
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("token endpoint unavailable")
+        return AccessToken(f"token-{len(self.calls)}", self.timer.now + self.lifetime)
+
+
+@pytest.fixture
+def timer():
+    return FakeTimer()
+
+
+def make_credential(timer: FakeTimer, **kwargs):
+    fake = FakeCredential(timer)
+    shared = SharedTokenCredential(fake, refresh_margin=600, retry_interval=30,
+                                   clock=timer.clock, sleep=timer.sleep, **kwargs)
+    return fake, shared
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_requests_acquire_once(timer):
+    async def run():
+        fake, shared = make_credential(timer)
+        tokens = await asyncio.gather(*(shared.get_token(SCOPE) for _ in range(10)))
+        await shared.close()
+        return fake, shared, tokens
+
+    fake, shared, tokens = asyncio.run(run())
+    assert len(fake.calls) == 1
+    assert {token.token for token in tokens} == {"token-1"}
+    assert shared.stats["acquisitions"] == 1
+
+
+def test_cached_token_is_reused(timer):
+    async def run():
+        fake, shared = make_credential(timer)
+        first = await shared.get_token(SCOPE)
+        second = await shared.get_token(SCOPE)
+        await shared.close()
+        return fake, shared, first, second
+
+    fake, shared, first, second = asyncio.run(run())
+    assert first is second
+    assert len(fake.calls) == 1
+    assert shared.stats["hits"] == 1
+
+
+def test_claims_bypass_the_cache(timer):
+    async def run():
+        fake, shared = make_credential(timer)
+        await shared.get_token(SCOPE)
+        challenged = await shared.get_token(SCOPE, claims='{"access_token": {}}')
+        cached = await shared.get_token(SCOPE)
+        await shared.close()
+        return fake, challenged, cached
+
+    fake, challenged, cached = asyncio.run(run())
+    assert len(fake.calls) == 2
+    assert fake.calls[1]["claims"] == '{"access_token": {}}'
+    assert challenged.token == "token-2"
+    assert cached.token == "token-1"
+
+
+def test_token_is_refreshed_before_expiry(timer):
+    async def run():
+        fake, shared = make_credential(timer)
+        await shared.get_token(SCOPE)
+        await settle()
+        # Sleeps until refresh_margin seconds before the token expires
+        assert timer.sleeps == [3600 - 600]
+        timer.advance()
+        await settle()
+        token = await shared.get_token(SCOPE)
+        await shared.close()
+        return fake, shared, token
+
+    fake, shared, token = asyncio.run(run())
+    assert len(fake.calls) == 2
+    assert token.token == "token-2"
+    assert shared.stats["background_refreshes"] == 1
+
+
+def test_failed_refresh_is_retried(timer):
+    async def run():
+        fake, shared = make_credential(timer)
+        await shared.get_token(SCOPE)
+        await settle()
+        fake.fail = True
+        timer.advance()
+        await settle()
+        failures = shared.stats["refresh_failures"]
+        # The old token is still valid and served from the cache meanwhile
+        cached = await shared.get_token(SCOPE)
+        fake.fail = False
+        timer.advance()
+        await settle()
+        refreshed = await shared.get_token(SCOPE)
+        await shared.close()
+        return shared, failures, cached, refreshed
+
+    shared, failures, cached, refreshed = asyncio.run(run())
+    assert failures == 1
+    assert cached.token == "token-1"
+    assert timer.sleeps == [3600 - 600, 30, 3600 - 600]
+    assert refreshed.token == "token-3"
+    assert shared.stats["background_refreshes"] == 1
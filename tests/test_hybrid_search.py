@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from fake_backends import fake_searcher_factory
+from mongodb_hybridsearch import MongoDBAtlasHybridSearch
+
+
+class RecordingCollection:
+    def __init__(self) -> None:
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return [{"_id": 1, "content": "tent"}]
+
+
+@pytest.fixture
+def searcher(monkeypatch):
+    monkeypatch.setenv("AZURE_AI_EMBEDDINGS_ENDPOINT", "https://embeddings.test")
+    monkeypatch.setenv("AZURE_AI_EMBEDDINGS_KEY", "test-key")
+    monkeypatch.setenv("MONGODB_ATLAS_TUNING_FILE", "")
+    searcher = MongoDBAtlasHybridSearch()
+    searcher._collection = RecordingCollection()
+    return searcher
+
+
+def test_latency_is_attributed_to_the_pipeline_num_candidates(searcher):
+    stage = searcher._vector_search_stage([0.1, 0.2], limit=5)
+    num_candidates = stage["$vectorSearch"]["numCandidates"]
+    # Another search chose a different numCandidates in between
+    searcher.tuner.choose(100)
+    assert searcher.tuner.metrics["num_candidates"] != num_candidates
+
+    asyncio.run(searcher._aggregate([stage], num_candidates))
+
+    assert list(searcher.tuner._observed) == [num_candidates]
+
+
+def test_result_cache_is_off_in_a_single_process(searcher, monkeypatch):
+    monkeypatch.setenv("FAKE_SEARCH_LATENCY_MS", "0")
+    monkeypatch.setenv("FAKE_EMBEDDING_LATENCY_MS", "0")
+    fake = fake_searcher_factory()
+    assert fake.result_cache_ttl == 0
+
+    async def search_twice():
+        first = await fake.async_hybrid_search_mongodb_atlas("tent")
+        second = await fake.async_hybrid_search_mongodb_atlas("tent")
+        return first, second
+
+    first, second = asyncio.run(search_twice())
+    assert first and first == second
+    assert fake.collection.calls == 2
+    assert "search" not in fake.cache.stats()["by_prefix"]
+
+    monkeypatch.setenv("SEARCH_WORKERS", "4")
+    assert MongoDBAtlasHybridSearch().result_cache_ttl == 60
+
+
+def test_get_metrics_is_async(searcher):
+    metrics = asyncio.run(searcher.get_metrics())
+    assert set(metrics) == {"tuning", "cache"}
+
+
+class FailingCollection:
+    def aggregate(self, pipeline):
+        raise RuntimeError("cluster unavailable")
+
+
+def test_backend_errors_are_flagged(monkeypatch):
+    monkeypatch.setenv("FAKE_EMBEDDING_LATENCY_MS", "0")
+    fake = fake_searcher_factory()
+    fake._collection = FailingCollection()
+    info = {"cache_hit": False, "error": None}
+
+    results = asyncio.run(fake._hybrid_search("tent", 3, None, info))
+
+    assert results == []
+    assert info["error"] == "RuntimeError: cluster unavailable"
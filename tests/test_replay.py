@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from replay import CACHES, percentile, replay, summarize
+
+
+def cache_stats(hits: int, misses: int) -> dict:
+    return {name: {"hits": hits, "misses": misses} for name in CACHES}
+
+
+def sample(latency_ms: float, result_count=3, error=None) -> dict:
+    return {"latency_ms": latency_ms, "service_ms": latency_ms / 2, "lag_ms": 1.0, "error": error,
+            "output_bytes": 2048, "result_count": result_count}
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile(values, 1.0) == 100
+    assert percentile([7], 0.5) == 7
+    assert percentile([], 0.5) is None
+
+
+def test_summarize_counts_errors_empty_results_and_cache_hits():
+    samples = [sample(10), sample(20), sample(30, result_count=0), sample(40, error="TimeoutError: ")]
+    requests = [{"query": "a", "cache_hit": True}, {"query": "b", "cache_hit": False, "error": "ConnectionFailure"},
+                {"query": "c"}, {"query": "d"}]
+
+    report = summarize(samples, 2.0, cache_stats(1, 1), cache_stats(3, 5), requests)
+
+    assert report["requests"] == 4
+    assert report["errors"] == 1
+    assert report["empty_results"] == 1
+    assert report["recorded_errors"] == 1
+    assert report["throughput_rps"] == 2.0
+    assert report["latency_ms"] == {"p50": 20, "p90": 30, "p99": 30, "max": 30}
+    assert report["cache"]["result"] == {"lookups": 6, "hits": 2, "hit_rate": 0.333}
+    assert report["cache"]["recorded_result_hit_rate"] == 0.5
+    assert report["output_size_histogram"]["<=2KB"] == 3
+    assert report["sample_errors"] == ["TimeoutError: "]
+
+
+class BlockingSearcher:
+    """Blocks the event loop for each search, so later requests start behind schedule."""
+
+    async def async_hybrid_search_mongodb_atlas(self, query, limit=3, include_fields=None):
+        time.sleep(0.05)
+        return [{"_id": query}]
+
+
+def test_open_loop_latency_is_measured_from_the_schedule():
+    requests = [{"ts": 0.0, "query": str(i), "limit": 3, "include_fields": None} for i in range(5)]
+
+    samples = asyncio.run(replay(requests, BlockingSearcher()))
+
+    service = max(sample["service_ms"] for sample in samples)
+    latency = max(sample["latency_ms"] for sample in samples)
+    assert service < 100
+    # The last request waited behind the four before it
+    assert latency >= 200
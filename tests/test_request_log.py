@@ -0,0 +1,44 @@
+import json
+
+from request_log import RequestRecorder, load_requests, result_count
+
+
+def test_load_requests_skips_invalid_lines_and_sorts(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"ts": 2.0, "query": "stove", "limit": 5}),
+        "not json",
+        json.dumps({"ts": 1.0, "query": "tent"}),
+        json.dumps({"ts": 3.0, "limit": 3}),
+        json.dumps(["query"]),
+        "",
+        json.dumps({"query": "lantern"}),
+    ]) + "\n", encoding="utf-8")
+
+    requests, skipped = load_requests(str(path))
+
+    assert skipped == 3
+    assert [record["query"] for record in requests] == ["lantern", "tent", "stove"]
+    assert requests[1] == {"ts": 1.0, "query": "tent", "limit": 3, "include_fields": None}
+    assert requests[2]["limit"] == 5
+
+
+def test_recorder_round_trip_with_error(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    recorder = RequestRecorder(str(path))
+    recorder.record("tent", 3, None, 10.0, 12.5, results=[{"_id": 1}], cache_hit=True)
+    recorder.record("stove", 3, ["_id"], 11.0, 3.0, results=[], error="ConnectionFailure: timed out")
+    recorder.close()
+
+    requests, skipped = load_requests(str(path))
+    assert skipped == 0
+    assert [(record["result_count"], record["cache_hit"], record["error"]) for record in requests] == [
+        (1, True, None),
+        (0, False, "ConnectionFailure: timed out"),
+    ]
+
+
+def test_result_count_of_columnar_output():
+    assert result_count('{"fields":["_id"],"rows":[[1],[2]]}') == 2
+    assert result_count("not json") is None
+    assert result_count([{"_id": 1}]) == 1
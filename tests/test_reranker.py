@@ -0,0 +1,78 @@
+import json
+import sys
+from pathlib import Path
+
+from reranker import LightweightReranker
+
+
+def make_docs():
+    return [
+        {"_id": "stove", "content": "Camping stove with two burners.", "embedding": [0.0, 1.0]},
+        {"_id": "tent", "content": "Lightweight backpacking tent for two.", "embedding": [1.0, 0.0]},
+        {"_id": "lantern", "content": "Rechargeable lantern.", "embedding": [0.5, 0.5]},
+    ]
+
+
+def test_rerank_orders_by_features_and_strips_embeddings():
+    reranker = LightweightReranker(fusion_weight=0.0, cosine_weight=0.6, bm25_weight=0.4, boost_weight=0.0)
+    ranked = reranker.rerank("lightweight tent", [1.0, 0.0], make_docs())
+    reranker.close()
+
+    assert [doc["_id"] for doc in ranked] == ["tent", "lantern", "stove"]
+    assert all("embedding" not in doc for doc in ranked)
+    assert ranked[0]["_rerank_score"] > ranked[1]["_rerank_score"] > ranked[2]["_rerank_score"]
+
+
+def test_fusion_prior_keeps_the_fusion_order_without_other_signals():
+    reranker = LightweightReranker()
+    docs = [{"_id": i, "content": "same text"} for i in range(5)]
+    ranked = reranker.rerank("unrelated query", None, docs)
+    reranker.close()
+    assert [doc["_id"] for doc in ranked] == [0, 1, 2, 3, 4]
+
+
+def test_cosine_scores_handle_missing_and_mismatched_vectors():
+    scores = LightweightReranker.cosine_scores([1.0, 0.0], [[2.0, 0.0], None, [1.0, 0.0, 0.0], [0.0, 0.0]])
+    assert scores[0] == 1.0
+    assert scores[1:] == [0.0, 0.0, 0.0]
+
+
+def test_pack_respects_limit_and_budget():
+    docs = [{"_id": i, "content": "x" * 100} for i in range(5)]
+    assert [doc["_id"] for doc in LightweightReranker.pack(docs, 10_000, limit=3)] == [0, 1, 2]
+
+    one_size = len(json.dumps(docs[0]).encode("utf-8")) + 2
+    packed = LightweightReranker.pack(docs, 2 + 2 * one_size, limit=5, min_chars=200)
+    assert [doc["_id"] for doc in packed] == [0, 1]
+    assert len(json.dumps(packed).encode("utf-8")) <= 2 + 2 * one_size
+
+
+def test_pack_shortens_content_down_to_min_chars():
+    docs = [{"_id": 0, "content": "a" * 1000}, {"_id": 1, "content": "b" * 1000}]
+    budget = 1600
+    packed = LightweightReranker.pack(docs, budget, limit=2, min_chars=200)
+    assert [doc["_id"] for doc in packed] == [0, 1]
+    assert packed[0]["content"] == "a" * 1000
+    assert packed[1]["content"].endswith("...") and 200 <= len(packed[1]["content"]) < 1000
+    assert len(json.dumps(packed).encode("utf-8")) <= budget
+
+    # Not enough room left for min_chars of content: the document is dropped
+    packed = LightweightReranker.pack(docs, budget, limit=2, min_chars=700)
+    assert [doc["_id"] for doc in packed] == [0]
+
+
+def test_rerank_at_least_matches_fusion_on_the_fixture():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+    from rerank_benchmark import FIXTURE_FILE, ndcg_at_k
+
+    queries = json.loads(FIXTURE_FILE.read_text(encoding="utf-8"))["queries"]
+    reranker = LightweightReranker()
+    fusion, reranked = [], []
+    for item in queries:
+        labels = {doc["_id"]: doc["label"] for doc in item["candidates"]}
+        docs = [{key: value for key, value in doc.items() if key != "label"} for doc in item["candidates"]]
+        fusion.append(ndcg_at_k([labels[doc["_id"]] for doc in docs], 3))
+        ranked = reranker.rerank(item["query"], item["query_vector"], docs)
+        reranked.append(ndcg_at_k([labels[doc["_id"]] for doc in ranked], 3))
+    reranker.close()
+    assert sum(reranked) >= sum(fusion)
@@ -0,0 +1,134 @@
+import asyncio
+import random
+
+import pytest
+
+from result_compaction import ResultCompactor
+
+WORDS = ("tent stove lantern kayak boots jacket backpack trail river summit forest shelter "
+         "paddle seam zipper strap buckle pocket sole ankle hood burner fuel rating").split()
+
+
+def shingles(compactor: ResultCompactor, text: str) -> set:
+    tokens = text.split()
+    k = compactor.shingle_size
+    return {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+
+def test_permutations_order_shingles_differently():
+    compactor = ResultCompactor()
+    hashes = list(range(1000, 1100))
+    argmins = {min(hashes, key=lambda h: (a * h + b) % (2 ** 61 - 1)) for a, b in compactor._perms}
+    assert len(argmins) > 10
+
+
+def test_estimated_similarity_tracks_jaccard():
+    compactor = ResultCompactor(num_perm=128)
+    rng = random.Random(3)
+    errors = []
+    for _ in range(100):
+        base = [rng.choice(WORDS) for _ in range(40)]
+        other = list(base)
+        for index in rng.sample(range(len(other)), rng.randint(0, 20)):
+            other[index] = rng.choice(WORDS)
+        first, second = " ".join(base), " ".join(other)
+        a, b = shingles(compactor, first), shingles(compactor, second)
+        jaccard = len(a & b) / len(a | b)
+        estimate = compactor.similarity(compactor.signature(first), compactor.signature(second))
+        errors.append(abs(estimate - jaccard))
+    assert sum(errors) / len(errors) < 0.06
+    assert max(errors) < 0.25
+
+
+def test_dedupe_keeps_distinct_passages():
+    compactor = ResultCompactor()
+    rng = random.Random(5)
+    docs = [{"_id": i, "content": " ".join(rng.choice(WORDS) for _ in range(30)) + "."} for i in range(20)]
+    assert len(compactor.dedupe(docs)) == 20
+    assert compactor.stats["passages_dropped"] == 0
+
+
+def test_dedupe_drops_near_duplicate_passages():
+    compactor = ResultCompactor()
+    shared = "Free shipping on orders over fifty dollars and a thirty day return policy on all outdoor gear."
+    docs = [
+        {"_id": 1, "content": "Two person tent with aluminium poles. " + shared},
+        {"_id": 2, "content": "Camping stove with two burners. " + shared},
+        {"_id": 3, "content": shared},
+    ]
+    deduped = compactor.dedupe(docs)
+    assert [doc["_id"] for doc in deduped] == [1, 2]
+    assert deduped[1]["content"] == "Camping stove with two burners."
+
+
+def test_dedupe_keeps_short_facts():
+    compactor = ResultCompactor()
+    docs = [
+        {"_id": 1, "content": "Two person tent with aluminium poles and a vestibule. Waterproof. Weight 2 kg."},
+        {"_id": 2, "content": "Three person tent with fibreglass poles and two doors. Waterproof. Weight 2 kg."},
+    ]
+    deduped = compactor.dedupe(docs)
+    assert deduped[1]["content"] == docs[1]["content"]
+    assert compactor.stats["passages_dropped"] == 0
+
+
+def test_dedupe_only_compares_lsh_candidates(monkeypatch):
+    compactor = ResultCompactor()
+    rng = random.Random(11)
+    docs = [{"_id": i, "content": " ".join(rng.choice(WORDS) for _ in range(30)) + "."} for i in range(50)]
+    calls = []
+    similarity = ResultCompactor.similarity
+    monkeypatch.setattr(compactor, "similarity", lambda a, b: calls.append(1) or similarity(a, b))
+    assert len(compactor.dedupe(docs + [dict(docs[3], _id="copy")])) == 50
+    # Distinct passages rarely share a band, the copy collides with its original
+    assert 1 <= len(calls) < 50
+
+
+def test_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        ResultCompactor(num_perm=64, bands=10)
+
+
+def test_windows_keep_query_term_matches():
+    compactor = ResultCompactor(max_chars=120, window_chars=40)
+    text = " ".join(["filler"] * 40) + " the stove has two burners " + " ".join(["filler"] * 40)
+    windowed = compactor.windows(text, ["stove", "the"])
+    assert "stove" in windowed
+    assert windowed.startswith("...") and windowed.endswith("...")
+    assert len(windowed) < len(text)
+
+
+def test_windows_fall_back_to_prefix_and_keep_short_text():
+    compactor = ResultCompactor(max_chars=50)
+    assert compactor.windows("short text", ["stove"]) == "short text"
+    text = "word " * 40
+    assert compactor.windows(text, ["stove"]) == text[:50] + "..."
+
+
+def test_compact_dedupes_and_windows():
+    compactor = ResultCompactor(max_chars=100, window_chars=40)
+    shared = "Free shipping on orders over fifty dollars and a thirty day return policy on all outdoor gear."
+    docs = [
+        {"_id": 1, "content": "Camping stove with two burners. " + shared},
+        {"_id": 2, "content": shared},
+        {"_id": 3, "content": " ".join(["filler"] * 40) + " rechargeable lantern " + " ".join(["filler"] * 40)},
+    ]
+    compacted = asyncio.run(compactor.acompact(docs, "rechargeable lantern"))
+    compactor.close()
+    assert [doc["_id"] for doc in compacted] == [1, 3]
+    assert "lantern" in compacted[1]["content"] and len(compacted[1]["content"]) < len(docs[2]["content"])
+    assert docs[2]["content"].startswith("filler")
+    assert compactor.stats["documents_dropped"] == 1
+    assert compactor.stats["bytes_out"] < compactor.stats["bytes_in"]
+
+
+def test_to_columnar():
+    docs = [{"_id": 1, "content": "a"}, {"_id": 2, "score": 0.5}]
+    assert ResultCompactor.to_columnar(docs) == {
+        "fields": ["_id", "content", "score"],
+        "rows": [[1, "a", None], [2, None, 0.5]],
+    }
+    assert ResultCompactor.to_columnar(docs, ["score", "_id"]) == {
+        "fields": ["score", "_id"],
+        "rows": [[None, 1], [0.5, 2]],
+    }
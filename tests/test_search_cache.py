@@ -0,0 +1,22 @@
+from search_cache import LocalCache, cache_key
+
+
+def test_hits_and_misses_are_counted_per_key_prefix():
+    cache = LocalCache(max_entries=10)
+    embedding_key = cache_key("embedding", "endpoint", "tent")
+    search_key = cache_key("search", "products", "tent", 3, None)
+
+    cache.get(embedding_key)
+    cache.set(embedding_key, [0.1, 0.2])
+    cache.get(embedding_key)
+    cache.get(search_key)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["by_prefix"] == {
+        "embedding": {"hits": 1, "misses": 1},
+        "search": {"hits": 0, "misses": 1},
+    }
+    # The returned counters are a copy
+    stats["by_prefix"]["search"]["hits"] = 5
+    assert cache.stats()["by_prefix"]["search"]["hits"] == 0
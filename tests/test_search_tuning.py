@@ -0,0 +1,49 @@
+from search_tuning import NumCandidatesTuner
+
+
+def make_tuner(**kwargs) -> NumCandidatesTuner:
+    tuner = NumCandidatesTuner(latency_slo_ms=250, pipeline_latency_slo_ms=300, **kwargs)
+    tuner.points = {
+        5: {"recall": 0.96, "latency_ms": 30.0},
+        10: {"recall": 0.99, "latency_ms": 50.0},
+    }
+    tuner.fit()
+    return tuner
+
+
+def test_chooses_smallest_num_candidates_meeting_recall_target():
+    assert make_tuner().choose(5) == 25
+
+
+def test_single_slow_query_does_not_exclude_num_candidates():
+    tuner = make_tuner()
+    tuner.choose(5)
+    tuner.observe(25, 400.0)
+    assert tuner.choose(5) == 25
+
+
+def test_slow_num_candidates_is_excluded_then_reprobed():
+    tuner = make_tuner(min_samples=3, reprobe_every=10)
+    for _ in range(3):
+        tuner.observe(tuner.choose(5), 400.0)
+    assert tuner.choose(5) == 50
+
+    choices = []
+    for _ in range(10):
+        num_candidates = tuner.choose(5)
+        choices.append(num_candidates)
+        tuner.observe(num_candidates, 20.0)
+    assert choices[-1] == 25
+    assert tuner.metrics["reprobes"] == 1
+
+    # Fast again: it stays chosen once enough new samples are in
+    for _ in range(5):
+        tuner.observe(tuner.choose(5), 20.0)
+    assert tuner.choose(5) == 25
+
+
+def test_online_latency_is_compared_with_the_pipeline_slo():
+    tuner = make_tuner(min_samples=1)
+    # Above the $vectorSearch SLO but within the end-to-end pipeline SLO
+    tuner.observe(25, 280.0)
+    assert tuner.choose(5) == 25
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from worker_pool import WorkerPool
+
+
+class EchoSearcher:
+    """Searcher stand-in: "crash" kills the worker process, "hang" never answers in time."""
+
+    async def async_hybrid_search_mongodb_atlas(self, search_content, limit=3, include_fields=None):
+        if search_content == "crash":
+            os._exit(3)
+        if search_content == "hang":
+            await asyncio.sleep(3)
+        return [{"content": search_content, "pid": os.getpid()}]
+
+    async def warm_up(self):
+        pass
+
+    async def get_metrics(self):
+        return {"cache": {"hits": 0, "misses": 0}}
+
+    async def close(self):
+        pass
+
+
+def echo_factory(cache=None):
+    return EchoSearcher()
+
+
+def failing_factory(cache=None):
+    raise KeyError("AZURE_AI_EMBEDDINGS_ENDPOINT")
+
+
+def make_pool(factory, **kwargs) -> WorkerPool:
+    return WorkerPool(num_workers=2, searcher_factory=factory, watchdog_interval=0.1, **kwargs)
+
+
+def test_searches_are_served():
+    async def run():
+        pool = make_pool(echo_factory)
+        await pool.warm_up()
+        results = await pool.async_hybrid_search_mongodb_atlas("tent")
+        metrics = await pool.get_metrics()
+        await pool.close()
+        return results, metrics
+
+    results, metrics = asyncio.run(run())
+    assert results[0]["content"] == "tent"
+    assert metrics["live_workers"] == [0, 1]
+    assert all(worker["cpu_seconds"] > 0 for worker in metrics["workers"])
+
+
+def test_searcher_failure_is_reported_at_start():
+    async def run():
+        pool = make_pool(failing_factory)
+        with pytest.raises(RuntimeError, match="KeyError"):
+            await asyncio.wait_for(pool.warm_up(), 30)
+        # Searches fail fast instead of hanging
+        results = await asyncio.wait_for(pool.async_hybrid_search_mongodb_atlas("tent"), 5)
+        await pool.close()
+        return results
+
+    assert asyncio.run(run()) == []
+
+
+def test_dead_worker_fails_its_requests_and_leaves_dispatch():
+    async def run():
+        pool = make_pool(echo_factory)
+        await pool.start()
+        crashed = await asyncio.wait_for(pool.async_hybrid_search_mongodb_atlas("crash"), 10)
+        live_workers = pool.live_workers
+        results = [await pool.async_hybrid_search_mongodb_atlas(f"query {i}") for i in range(4)]
+        await pool.close()
+        return crashed, live_workers, results
+
+    crashed, live_workers, results = asyncio.run(run())
+    assert crashed == []
+    assert len(live_workers) == 1
+    assert all(result and result[0]["content"].startswith("query") for result in results)
+
+
+def test_request_timeout():
+    async def run():
+        pool = make_pool(echo_factory, request_timeout=0.5)
+        await pool.start()
+        start = time.perf_counter()
+        results = await pool.async_hybrid_search_mongodb_atlas("hang")
+        elapsed = time.perf_counter() - start
+        await pool.close()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run())
+    assert results == []
+    assert elapsed < 5
@@ -1,10 +1,14 @@
-from pathlib import Path
+from __future__ import annotations
 
-from azure.ai.agents.aio import AgentsClient
-from azure.ai.agents.models import ThreadMessage
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 from terminal_colors import TerminalColors as tc
 
+if TYPE_CHECKING:
+    from azure.ai.agents.aio import AgentsClient
+    from azure.ai.agents.models import ThreadMessage
+
 
 class Utilities:
     # propert to get the relative path of shared files
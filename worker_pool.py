@@ -0,0 +1,351 @@
+"""
+Multi-process search workers behind a local dispatcher.
+
+A single asyncio process tops out on one core: embedding bookkeeping, pymongo calls, JSON
+serialization and truncation all run on it. `WorkerPool` runs N worker processes, each with
+its own event loop, `MongoDBAtlasHybridSearch` and connection pools, and dispatches searches
+to the least busy worker. Workers share the embedding and result caches through a
+`SharedCacheServer`, so adding a worker doesn't multiply cache misses.
+
+`WorkerPool.async_hybrid_search_mongodb_atlas` has the same signature as the search tool, so
+the pool can be registered with the agent in place of a single searcher (see SEARCH_WORKERS).
+
+Each worker reports whether its searcher was built before `start()` returns. A watchdog in the
+response reader notices workers that exit, fails their pending requests and stops dispatching
+to them, and every request has a timeout, so a dead or stuck worker never hangs a search.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from search_cache import SharedCacheClient, SharedCacheServer
+
+
+def default_searcher_factory(cache=None):
+    """Build a `MongoDBAtlasHybridSearch` using the live backends."""
+    from mongodb_hybridsearch import MongoDBAtlasHybridSearch
+
+    return MongoDBAtlasHybridSearch(cache=cache)
+
+
+def _worker_main(worker_id: int, num_workers: int, factory: Callable, cache_address, authkey: bytes,
+                 requests, responses, concurrency: int) -> None:
+    """Entry point of a worker process."""
+    # Searchers configure themselves for the pool (e.g. result caching on the shared tier)
+    os.environ.setdefault("SEARCH_WORKERS", str(num_workers))
+    asyncio.run(_worker_loop(worker_id, factory, cache_address, authkey, requests, responses, concurrency))
+
+
+async def _worker_loop(worker_id: int, factory: Callable, cache_address, authkey: bytes,
+                       requests, responses, concurrency: int) -> None:
+    """Serve requests from the dispatcher until the stop sentinel is received."""
+    cache = SharedCacheClient(cache_address, authkey)
+    # Report whether the searcher could be built, with request ID None
+    try:
+        searcher = factory(cache=cache)
+    except Exception as e:
+        responses.put((None, worker_id, False, f"{type(e).__name__}: {e}"))
+        return
+    responses.put((None, worker_id, True, None))
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def handle(request_id: int, kind: str, kwargs: dict) -> None:
+        try:
+            if kind == "search":
+                payload = await searcher.async_hybrid_search_mongodb_atlas(**kwargs)
+            elif kind == "warm_up":
+                payload = await searcher.warm_up()
+            elif kind == "metrics":
+                # CPU seconds of the worker process, to tell CPU-bound from I/O-bound scaling
+                payload = dict(await searcher.get_metrics(), cpu_seconds=time.process_time())
+            else:
+                raise ValueError(f"Unknown request kind '{kind}'")
+            responses.put((request_id, worker_id, True, payload))
+        except Exception as e:
+            responses.put((request_id, worker_id, False, f"{type(e).__name__}: {e}"))
+        finally:
+            semaphore.release()
+
+    while True:
+        message = await loop.run_in_executor(None, requests.get)
+        if message is None:
+            break
+        await semaphore.acquire()
+        task = asyncio.create_task(handle(*message))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await searcher.close()
+
+
+class WorkerPool:
+    """
+    Dispatch hybrid searches to a pool of worker processes sharing one cache tier.
+
+    Args:
+        num_workers: Number of worker processes (default: the number of CPUs).
+        searcher_factory: Top-level (picklable) callable `factory(cache=...)` returning a searcher.
+        concurrency_per_worker: Maximum searches in flight in each worker.
+        cache_max_entries: Size of the shared cache.
+        cache_ttl_seconds: Default time to live of shared cache entries.
+        request_timeout: Seconds to wait for a worker's response before failing the request.
+        start_timeout: Seconds to wait for the workers to build their searchers.
+        watchdog_interval: Seconds between checks that the worker processes are alive.
+    """
+
+    def __init__(self,
+            num_workers: Optional[int] = None,
+            searcher_factory: Callable = default_searcher_factory,
+            concurrency_per_worker: int = 8,
+            cache_max_entries: int = 4096,
+            cache_ttl_seconds: float = 300.0,
+            request_timeout: float = 60.0,
+            start_timeout: float = 60.0,
+            watchdog_interval: float = 1.0
+        ) -> None:
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.searcher_factory = searcher_factory
+        self.concurrency_per_worker = concurrency_per_worker
+        self.cache_max_entries = cache_max_entries
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.request_timeout = request_timeout
+        self.start_timeout = start_timeout
+        self.watchdog_interval = watchdog_interval
+
+        self._context = multiprocessing.get_context("spawn")
+        self._cache_server: Optional[SharedCacheServer] = None
+        self._processes: List = []
+        self._request_queues: List = []
+        self._responses = None
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Request ID -> (worker ID, future)
+        self._pending: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._in_flight: List[int] = []
+        self._alive: List[bool] = []
+        self._ready: List[asyncio.Future] = []
+        self._ids = itertools.count()
+        self._start_lock = asyncio.Lock()
+        self.dispatched: List[int] = []
+
+    @classmethod
+    def from_env(cls) -> "WorkerPool":
+        """Create a pool configured from SEARCH_WORKERS* environment variables."""
+        return cls(
+            num_workers=int(os.getenv("SEARCH_WORKERS", "0")) or None,
+            concurrency_per_worker=int(os.getenv("SEARCH_WORKER_CONCURRENCY", "8")),
+            cache_max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "4096")),
+            cache_ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300")),
+            request_timeout=float(os.getenv("SEARCH_WORKER_TIMEOUT_SECONDS", "60")),
+        )
+
+    @property
+    def started(self) -> bool:
+        return bool(self._processes)
+
+    @property
+    def live_workers(self) -> List[int]:
+        """IDs of the workers requests can be dispatched to."""
+        return [worker_id for worker_id, alive in enumerate(self._alive) if alive]
+
+    async def start(self) -> None:
+        """
+        Start the shared cache server and the worker processes.
+
+        Returns once every worker has reported whether its searcher was built. Workers that
+        failed (or didn't report within `start_timeout`) are left out of dispatch.
+
+        Raises:
+            RuntimeError: If no worker could build its searcher.
+        """
+        async with self._start_lock:
+            if self.started:
+                return
+            self._loop = asyncio.get_running_loop()
+            self._cache_server = await asyncio.to_thread(
+                SharedCacheServer, max_entries=self.cache_max_entries, ttl_seconds=self.cache_ttl_seconds)
+            self._responses = self._context.Queue()
+            for worker_id in range(self.num_workers):
+                requests = self._context.Queue()
+                process = self._context.Process(
+                    target=_worker_main,
+                    args=(worker_id, self.num_workers, self.searcher_factory, self._cache_server.address,
+                          self._cache_server.authkey, requests, self._responses, self.concurrency_per_worker),
+                    daemon=True,
+                )
+                process.start()
+                self._request_queues.append(requests)
+                self._processes.append(process)
+            self._in_flight = [0] * self.num_workers
+            self.dispatched = [0] * self.num_workers
+            self._alive = [True] * self.num_workers
+            self._ready = [self._loop.create_future() for _ in range(self.num_workers)]
+            self._reader = threading.Thread(target=self._read_responses, name="worker-pool-responses", daemon=True)
+            self._reader.start()
+
+            await asyncio.wait(self._ready, timeout=self.start_timeout)
+            errors = []
+            for worker_id, ready in enumerate(self._ready):
+                if not ready.done():
+                    self._mark_dead(worker_id, f"not ready after {self.start_timeout:.0f}s")
+                    self._processes[worker_id].terminate()
+                ok, error = ready.result()
+                if not ok:
+                    errors.append(f"worker {worker_id}: {error}")
+            if errors:
+                print(f"Search workers failed to start: {'; '.join(errors)}")
+            if not self.live_workers:
+                raise RuntimeError(f"No search worker started: {'; '.join(errors)}")
+
+    def _read_responses(self) -> None:
+        """
+        Resolve the dispatcher futures from the worker responses (runs in a thread).
+
+        Also checks every `watchdog_interval` seconds that the worker processes are alive.
+        """
+        last_check = time.monotonic()
+        while True:
+            try:
+                message = self._responses.get(timeout=self.watchdog_interval)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+            if message:
+                self._loop.call_soon_threadsafe(self._resolve, *message)
+            if time.monotonic() - last_check >= self.watchdog_interval:
+                last_check = time.monotonic()
+                for worker_id, process in enumerate(self._processes):
+                    if not process.is_alive():
+                        self._loop.call_soon_threadsafe(
+                            self._mark_dead, worker_id, f"exited with code {process.exitcode}")
+
+    def _resolve(self, request_id: Optional[int], worker_id: int, ok: bool, payload) -> None:
+        if request_id is None:
+            # Startup report of the worker
+            if not self._ready[worker_id].done():
+                self._ready[worker_id].set_result((ok, payload))
+            if not ok:
+                self._mark_dead(worker_id, f"failed to start: {payload}")
+            return
+        entry = self._pending.pop(request_id, None)
+        if entry is None:
+            return
+        self._in_flight[worker_id] -= 1
+        future = entry[1]
+        if future.done():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(f"Worker {worker_id} failed: {payload}"))
+
+    def _mark_dead(self, worker_id: int, reason: str) -> None:
+        """Stop dispatching to a worker and fail its pending requests."""
+        if not self._alive[worker_id]:
+            return
+        self._alive[worker_id] = False
+        if not self._ready[worker_id].done():
+            self._ready[worker_id].set_result((False, reason))
+        for request_id, (owner, future) in list(self._pending.items()):
+            if owner != worker_id:
+                continue
+            del self._pending[request_id]
+            self._in_flight[worker_id] -= 1
+            if not future.done():
+                future.set_exception(RuntimeError(f"Worker {worker_id} {reason}"))
+
+    async def _dispatch(self, kind: str, kwargs: dict, worker_id: Optional[int] = None):
+        """
+        Send a request to a worker (the least busy live one by default) and wait for its response.
+
+        Raises:
+            RuntimeError: If the worker is dead, fails the request or doesn't answer within
+                `request_timeout` seconds.
+        """
+        await self.start()
+        if worker_id is None:
+            live_workers = self.live_workers
+            if not live_workers:
+                raise RuntimeError("No live search workers")
+            worker_id = min(live_workers, key=self._in_flight.__getitem__)
+        elif not self._alive[worker_id]:
+            raise RuntimeError(f"Worker {worker_id} is not running")
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = (worker_id, future)
+        self._in_flight[worker_id] += 1
+        self.dispatched[worker_id] += 1
+        self._request_queues[worker_id].put((request_id, kind, kwargs))
+        try:
+            return await asyncio.wait_for(future, self.request_timeout)
+        except asyncio.TimeoutError:
+            if self._pending.pop(request_id, None) is not None:
+                self._in_flight[worker_id] -= 1
+            raise RuntimeError(f"Worker {worker_id} did not answer within {self.request_timeout:.0f}s")
+
+    async def async_hybrid_search_mongodb_atlas(self,
+            search_content: str,
+            limit: int = 3,
+            include_fields: Optional[List[str]] = None
+        ):
+        """
+        Connects to MongoDB Atlas and performs a hybrid search (text + vector) on the specified collection.
+        Falls back to vector-only search if $rankFusion is not supported.
+
+        Assumes the collection has a text index and a vector index (for example, using Atlas Vector Search).
+
+        Args:
+            search_content (str): The content to search for (text or embedding).
+            limit (int): Maximum number of results to return (default: 3, max: 5)
+            include_fields (list): List of fields to include in results (reduces output size)
+
+        Returns:
+            list: List of matching documents with limited fields to stay under 512KB limit.
+        """
+        try:
+            return await self._dispatch("search", {
+                "search_content": search_content,
+                "limit": limit,
+                "include_fields": include_fields,
+            })
+        except RuntimeError as e:
+            print(f"Error in hybrid_search_mongodb_atlas: {e}")
+            return []
+
+    async def warm_up(self) -> None:
+        """Start the workers and warm up the connections of each live one."""
+        await self.start()
+        await asyncio.gather(*(self._dispatch("warm_up", {}, worker_id) for worker_id in self.live_workers))
+
+    async def get_metrics(self) -> dict:
+        """Metrics and CPU seconds of each live worker and the number of searches dispatched to each worker."""
+        await self.start()
+        live_workers = self.live_workers
+        metrics = await asyncio.gather(*(self._dispatch("metrics", {}, worker_id) for worker_id in live_workers))
+        return {"workers": metrics, "live_workers": live_workers, "dispatched": list(self.dispatched)}
+
+    async def close(self) -> None:
+        """Stop the workers, the response reader and the shared cache server."""
+        if not self.started:
+            return
+        for requests in self._request_queues:
+            requests.put(None)
+        await asyncio.to_thread(lambda: [process.join(timeout=10) for process in self._processes])
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        self._responses.put(None)
+        await asyncio.to_thread(self._reader.join, 5)
+        self._cache_server.shutdown()
+        self._processes = []
+        self._request_queues = []